@@ -0,0 +1,90 @@
+"""
+Amount parsing module for Personal Finance Application
+
+Parses the money column of bank exports into integer cents and a sign in
+one vectorized pass, whatever the decimal convention of the file
+(1.234,56 € or 1,234.56) and wherever the currency symbol or sign sits.
+"""
+
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_CURRENCY = r"(?:€|\$|£|EUR|USD|GBP)"
+
+# Sign, currency and thousands separators may appear around the number;
+# '(' ... ')' and a trailing '-' are accounting-style negatives
+_AMOUNT_PATTERN = (
+    r"^\s*(?P<lead_sign>[-+−(])?\s*{currency}?\s*(?P<sign>[-+−])?\s*"
+    r"(?P<integer>\d{{1,3}}(?:{thousands}\d{{3}})+|\d+)"
+    r"(?:{decimal}(?P<fraction>\d{{1,2}}))?"
+    r"\s*{currency}?\s*(?P<trail_sign>[-)])?\s*$"
+)
+
+AMOUNT_PATTERNS = {
+    ",": re.compile(_AMOUNT_PATTERN.format(currency=_CURRENCY, thousands=r"[.\s ']", decimal=",")),
+    ".": re.compile(_AMOUNT_PATTERN.format(currency=_CURRENCY, thousands=r"[,\s ']", decimal=r"\.")),
+}
+
+# A separator followed by one or two final digits is a decimal separator
+_DECIMAL_HINTS = {
+    ",": re.compile(r"\d,\d{1,2}(?!\d)"),
+    ".": re.compile(r"\d\.\d{1,2}(?!\d)"),
+}
+
+
+def detect_decimal_separator(values: pd.Series) -> str:
+    """
+    Detect the decimal separator used by a column of amounts.
+
+    Args:
+        values (pd.Series): Raw amount strings
+
+    Returns:
+        str: ',' or '.', whichever more values use as decimal separator.
+            Ties (e.g. only whole amounts) fall back to ',' as in Spanish exports.
+    """
+    comma = values.str.contains(_DECIMAL_HINTS[","], na=False).sum()
+    dot = values.str.contains(_DECIMAL_HINTS["."], na=False).sum()
+    return "." if dot > comma else ","
+
+
+def parse_amounts(values: pd.Series, decimal: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a column of money amounts into integer cents and signs.
+
+    Args:
+        values (pd.Series): Amount column as read from CSV (strings or numbers)
+        decimal (str, optional): Decimal separator, ',' or '.'. Detected from
+            values when not given; pass it when a file is parsed in chunks so
+            every chunk is read with the same convention.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (absolute amount in cents as int64,
+            sign as int8: 1 positive, -1 negative, 0 unparseable) per row
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.to_numpy(dtype=float)
+        valid = np.isfinite(numbers)
+        cents = np.rint(np.abs(np.where(valid, numbers, 0)) * 100).astype(np.int64)
+        signs = np.where(valid, np.where(numbers < 0, -1, 1), 0).astype(np.int8)
+        return cents, signs
+
+    text = values.astype(object).where(values.notna(), "").astype(str)
+    if decimal is None:
+        decimal = detect_decimal_separator(text)
+    parts = text.str.extract(AMOUNT_PATTERNS[decimal])
+
+    valid = parts['integer'].notna().to_numpy()
+    whole = parts['integer'].str.replace(r"\D", "", regex=True).fillna("0").astype(np.int64)
+    fraction = parts['fraction'].fillna("").str.ljust(2, "0").astype(np.int64)
+    cents = np.where(valid, whole.to_numpy() * 100 + fraction.to_numpy(), 0)
+
+    negative = (
+        parts['lead_sign'].isin(["-", "−", "("]) | parts['sign'].isin(["-", "−"])
+        | parts['trail_sign'].isin(["-", ")"])
+    ).to_numpy()
+    signs = np.where(valid, np.where(negative, -1, 1), 0).astype(np.int8)
+    return cents.astype(np.int64), signs
@@ -0,0 +1,277 @@
+"""
+Categorization benchmark for Personal Finance Application
+
+Generates synthetic transaction frames and category dictionaries and times
+each categorization implementation on them. Runs headless (no Streamlit) and
+prints one JSON object per measurement, so results can be compared between
+releases.
+
+Usage:
+    python benchmark_categorization.py --rows 1000 100000 --keywords 10 1000
+    python benchmark_categorization.py --output results.jsonl
+"""
+
+import argparse
+import json
+import platform
+import random
+import string
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from categorizer import (
+    UNCATEGORIZED_CATEGORY, KeywordMatcher, _compile_matcher, get_matcher, match_concepts
+)
+from database import CATEGORICAL_COLUMNS
+from merchants import normalize_merchants
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_KEYWORDS = [10, 100, 1_000, 5_000]
+DEFAULT_CATEGORIES = 20
+
+# Rows x keywords above which the legacy loop is skipped (it would take hours)
+DEFAULT_LEGACY_MAX_WORK = 5_000_000
+
+PREFIXES = ["COMPRA TARJ. {card}", "PAGO MOVIL EN", "RECIBO", "TRANSFERENCIA", "COMPRA EN", "BIZUM"]
+SUFFIXES = ["", "MADRID", "VALENCIA ES", "{date}", "REF {ref}"]
+
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+
+def _random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(4, 10)))
+
+
+def generate_categories(n_keywords: int, n_categories: int = DEFAULT_CATEGORIES,
+                        seed: int = 0) -> Dict[str, List[str]]:
+    """
+    Build a categories dictionary with n_keywords merchant keywords in total.
+
+    Args:
+        n_keywords (int): Total number of keywords
+        n_categories (int): Number of categories to spread them over
+        seed (int): Random seed
+
+    Returns:
+        Dict[str, List[str]]: Category name -> keywords
+    """
+    rng = random.Random(seed)
+    categories = {UNCATEGORIZED_CATEGORY: []}
+    names = [f"Category {i:02d}" for i in range(n_categories)]
+    for name in names:
+        categories[name] = []
+    for i in range(n_keywords):
+        words = [_random_word(rng) for _ in range(rng.choice([1, 1, 2]))]
+        categories[names[i % n_categories]].append(" ".join(words))
+    return categories
+
+
+def generate_transactions(n_rows: int, categories: Dict[str, List[str]],
+                          match_rate: float = 0.8, seed: int = 0) -> pd.DataFrame:
+    """
+    Build a transactions frame whose descriptions mention known merchants.
+
+    Merchants follow a Zipf-like distribution, like real statements where a
+    few shops and direct debits repeat all the time.
+
+    Args:
+        n_rows (int): Number of transactions
+        categories (Dict): Categories the descriptions should match
+        match_rate (float): Share of rows mentioning a keyword
+        seed (int): Random seed
+
+    Returns:
+        pd.DataFrame: Frame with 'Fecha valor', 'Concepto', 'Importe' and 'Tipo'
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+
+    keywords = [keyword for name, kws in categories.items()
+                if name != UNCATEGORIZED_CATEGORY for keyword in kws]
+    unknown = [_random_word(rng) + " " + _random_word(rng) for _ in range(max(10, len(keywords) // 4))]
+
+    # A bounded merchant pool keeps descriptions repeating as in real exports
+    pool_size = max(50, min(n_rows // 5, 20_000))
+    pool = []
+    for _ in range(pool_size):
+        merchant = rng.choice(keywords) if keywords and rng.random() < match_rate else rng.choice(unknown)
+        prefix = rng.choice(PREFIXES).format(card=f"{rng.randint(4000, 4999)}XXXXXXXX{rng.randint(1000, 9999)}")
+        suffix = rng.choice(SUFFIXES).format(
+            date=f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}",
+            ref=rng.randint(10_000_000, 99_999_999),
+        )
+        pool.append(f"{prefix} {merchant} {suffix}".strip())
+
+    weights = 1.0 / np.arange(1, pool_size + 1)
+    picks = np_rng.choice(pool_size, size=n_rows, p=weights / weights.sum())
+    concepts = np.array(pool, dtype=object)[picks]
+
+    amounts = np.round(np_rng.lognormal(3, 1, n_rows), 2)
+    return pd.DataFrame({
+        'Fecha valor': pd.Timestamp("2020-01-01") + pd.to_timedelta(np_rng.integers(0, 1800, n_rows), unit="D"),
+        'Concepto': concepts,
+        'Importe': amounts,
+        'Tipo': np.where(np_rng.random(n_rows) < 0.9, 'Debit', 'Credit'),
+    })
+
+
+# ============================================================================
+# IMPLEMENTATIONS
+# ============================================================================
+
+def categorize_legacy(df: pd.DataFrame, categories: Dict[str, List[str]]) -> pd.Series:
+    """Original implementation: categories x rows x keywords, last category wins."""
+    result = pd.Series(UNCATEGORIZED_CATEGORY, index=df.index, dtype=object)
+    for category, keywords in categories.items():
+        if category == UNCATEGORIZED_CATEGORY or not keywords:
+            continue
+        lowered_keywords = [keyword.lower().strip() for keyword in keywords]
+        for idx, row in df.iterrows():
+            details = row['Concepto'].lower().strip()
+            if any(keyword in details for keyword in lowered_keywords):
+                result.at[idx] = category
+    return result
+
+
+def categorize_matcher(df: pd.DataFrame, categories: Dict[str, List[str]]) -> pd.Series:
+    """Aho-Corasick matcher over raw descriptions, distinct values matched once."""
+    return KeywordMatcher(categories).categorize(df['Concepto'])
+
+
+def categorize_merchants(df: pd.DataFrame, categories: Dict[str, List[str]]) -> pd.Series:
+    """App pipeline without the database memo: merchant keys, then the matcher."""
+    merchants = normalize_merchants(df['Concepto'])
+    matcher = get_matcher(categories)
+    codes, uniques = pd.factorize(merchants)
+    lookup = np.array(match_concepts(matcher, list(uniques)) + [UNCATEGORIZED_CATEGORY], dtype=object)
+    return pd.Series(lookup.take(codes), index=df.index)
+
+
+IMPLEMENTATIONS: Dict[str, Callable[[pd.DataFrame, Dict[str, List[str]]], pd.Series]] = {
+    "legacy": categorize_legacy,
+    "matcher": categorize_matcher,
+    "merchants": categorize_merchants,
+}
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def measure(implementation: Callable, df: pd.DataFrame, categories: Dict[str, List[str]],
+            track_memory: bool = True) -> Dict[str, float]:
+    """
+    Time one implementation and optionally record its peak traced memory.
+
+    Timing and memory use separate runs, since tracemalloc slows Python down.
+
+    Returns:
+        Dict[str, float]: seconds, rows_per_second and peak_memory_mb
+    """
+    # Compiled matchers are cached; start every measurement cold
+    _compile_matcher.cache_clear()
+
+    start = time.perf_counter()
+    implementation(df, categories)
+    seconds = time.perf_counter() - start
+
+    peak_mb = None
+    if track_memory:
+        _compile_matcher.cache_clear()
+        tracemalloc.start()
+        implementation(df, categories)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 2 ** 20
+
+    return {
+        "seconds": round(seconds, 6),
+        "rows_per_second": round(len(df) / seconds, 1) if seconds else None,
+        "peak_memory_mb": round(peak_mb, 3) if peak_mb is not None else None,
+    }
+
+
+def frame_memory(df: pd.DataFrame, categories: Dict[str, List[str]]) -> Dict[str, float]:
+    """
+    Measure the bytes per row of a categorized transactions frame.
+
+    Compares plain object string columns with the categoricals the database
+    loads (see database.CATEGORICAL_COLUMNS).
+
+    Returns:
+        Dict[str, float]: object_bytes_per_row and categorical_bytes_per_row
+    """
+    frame = df.assign(Category=categorize_matcher(df, categories))
+    as_object = frame.astype({column: object for column in CATEGORICAL_COLUMNS})
+    as_categorical = frame.astype({column: 'category' for column in CATEGORICAL_COLUMNS})
+    return {
+        "object_bytes_per_row": round(as_object.memory_usage(deep=True).sum() / len(frame), 1),
+        "categorical_bytes_per_row": round(as_categorical.memory_usage(deep=True).sum() / len(frame), 1),
+    }
+
+
+def run(rows: List[int], keywords: List[int], implementations: List[str],
+        legacy_max_work: int, track_memory: bool, seed: int):
+    """Run every rows x keywords x implementation combination and yield results."""
+    environment = {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+    for n_keywords in keywords:
+        categories = generate_categories(n_keywords, seed=seed)
+        for n_rows in rows:
+            df = generate_transactions(n_rows, categories, seed=seed)
+            memory = frame_memory(df, categories)
+            for name in implementations:
+                result = {
+                    "implementation": name,
+                    "rows": n_rows,
+                    "keywords": n_keywords,
+                    "unique_concepts": int(df['Concepto'].nunique()),
+                    **memory,
+                    **environment,
+                }
+                if name == "legacy" and n_rows * n_keywords > legacy_max_work:
+                    result["skipped"] = f"rows x keywords above --legacy-max-work ({legacy_max_work})"
+                else:
+                    result.update(measure(IMPLEMENTATIONS[name], df, categories, track_memory))
+                yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark transaction categorization throughput.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS,
+                        help="Transaction counts to generate")
+    parser.add_argument("--keywords", type=int, nargs="+", default=DEFAULT_KEYWORDS,
+                        help="Keyword counts to generate")
+    parser.add_argument("--implementations", nargs="+", default=list(IMPLEMENTATIONS),
+                        choices=list(IMPLEMENTATIONS), help="Implementations to time")
+    parser.add_argument("--legacy-max-work", type=int, default=DEFAULT_LEGACY_MAX_WORK,
+                        help="Skip the legacy loop above this rows x keywords product")
+    parser.add_argument("--no-memory", action="store_true", help="Skip peak memory measurement")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for synthetic data")
+    parser.add_argument("--output", help="Append JSON lines to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for result in run(args.rows, args.keywords, args.implementations,
+                          args.legacy_max_work, not args.no_memory, args.seed):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
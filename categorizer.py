@@ -0,0 +1,330 @@
+"""
+Categorization module for Personal Finance Application
+
+Compiles the keyword lists from categories.json into a single multi-pattern
+matcher (Aho-Corasick automaton) so every transaction description is scanned
+once, no matter how many categories or keywords are configured.
+
+The app matches keywords against merchant keys (see merchants.py) rather than
+raw descriptions. Keywords are compiled as written: merchant keys only lose
+card numbers, numeric tokens and punctuation, so a keyword made of words
+that appears in a description also appears in its key.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+UNCATEGORIZED_CATEGORY = "Uncategorized"
+
+# Below this many descriptions, matching in-process beats paying for pool startup
+PARALLEL_MIN_ROWS = 50_000
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton built from a categories dictionary.
+
+    Matching is case-insensitive substring matching, the same rule the app has
+    always used. When several keywords match one description the winner is
+    chosen with this precedence:
+
+    1. The longest matching keyword wins.
+    2. On equal length, the category listed first in categories.json wins.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]],
+                 uncategorized: str = UNCATEGORIZED_CATEGORY):
+        """
+        Compile the automaton.
+
+        Args:
+            categories (Dict): Category name -> list of keywords
+            uncategorized (str): Category returned when nothing matches
+        """
+        self.uncategorized = uncategorized
+        self.category_names: List[str] = []
+        # Per node: outgoing transitions, failure link and best output as
+        # (keyword_length, -category_rank) so a plain max() applies precedence
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[Optional[tuple]] = [None]
+
+        ranked_keywords = []
+        for category, keywords in categories.items():
+            if category == uncategorized or not keywords:
+                continue
+            rank = len(self.category_names)
+            self.category_names.append(category)
+            ranked_keywords.extend((keyword, rank) for keyword in keywords)
+
+        for keyword, rank in ranked_keywords:
+            keyword = keyword.lower().strip()
+            if keyword:
+                self._add_keyword(keyword, rank)
+
+        self._build_failure_links()
+
+    def _add_keyword(self, keyword: str, rank: int):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = next_node
+
+        output = (len(keyword), -rank)
+        if self._best[node] is None or output > self._best[node]:
+            self._best[node] = output
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            # Inherit the best output reachable through the failure chain so
+            # matching only has to look at the current node
+            fail_best = self._best[self._fail[node]]
+            if fail_best is not None and (self._best[node] is None or fail_best > self._best[node]):
+                self._best[node] = fail_best
+
+            for char, child in self._goto[node].items():
+                state = self._fail[node]
+                while state and char not in self._goto[state]:
+                    state = self._fail[state]
+                self._fail[child] = self._goto[state].get(char, 0)
+                queue.append(child)
+
+    @property
+    def is_empty(self) -> bool:
+        """True when no keywords were compiled."""
+        return not self.category_names
+
+    def match(self, text: str) -> str:
+        """
+        Find the category for a single transaction description.
+
+        Args:
+            text (str): Transaction description (Concepto)
+
+        Returns:
+            str: Winning category, or the uncategorized category
+        """
+        goto, fail, best_at = self._goto, self._fail, self._best
+        node = 0
+        best = None
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            output = best_at[node]
+            if output is not None and (best is None or output > best):
+                best = output
+
+        if best is None:
+            return self.uncategorized
+        return self.category_names[-best[1]]
+
+    def match_many(self, texts: Iterable[str]) -> List[str]:
+        """
+        Categorize a sequence of descriptions.
+
+        Args:
+            texts (Iterable[str]): Transaction descriptions
+
+        Returns:
+            List[str]: One category per description, in input order
+        """
+        if self.is_empty:
+            return [self.uncategorized for _ in texts]
+        match = self.match
+        return [match(text) if isinstance(text, str) else self.uncategorized for text in texts]
+
+    def categorize(self, concepts: pd.Series) -> pd.Series:
+        """
+        Categorize a whole column of descriptions.
+
+        Each distinct description is matched once and the result is
+        broadcast back to every row that carries it.
+
+        Args:
+            concepts (pd.Series): Concepto column
+
+        Returns:
+            pd.Series: Categories aligned with the input index
+        """
+        codes, uniques = factorize_concepts(concepts)
+        return broadcast_categories(codes, self.match_many(uniques), concepts.index, self.uncategorized)
+
+
+# Matcher unpickled once per worker process by the pool initializer
+_worker_matcher: Optional[KeywordMatcher] = None
+
+
+def _init_worker(matcher: KeywordMatcher):
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _match_chunk(texts: List[str]) -> List[str]:
+    return _worker_matcher.match_many(texts)
+
+
+def match_concepts(matcher: KeywordMatcher, texts: Sequence[str],
+                   parallel_threshold: int = PARALLEL_MIN_ROWS,
+                   max_workers: Optional[int] = None) -> List[str]:
+    """
+    Categorize descriptions, using a process pool for large batches.
+
+    Batches smaller than parallel_threshold are matched in-process. Larger
+    ones are split into chunks and matched in a ProcessPoolExecutor; every
+    worker receives a pickled copy of the compiled matcher once, and results
+    come back in input order.
+
+    Args:
+        matcher (KeywordMatcher): Compiled matcher
+        texts (Sequence[str]): Transaction descriptions
+        parallel_threshold (int): Minimum batch size for the process pool
+        max_workers (int, optional): Pool size, defaults to the CPU count
+
+    Returns:
+        List[str]: One category per description, in input order
+    """
+    workers = max_workers or os.cpu_count() or 1
+    if len(texts) < parallel_threshold or workers < 2 or matcher.is_empty:
+        return matcher.match_many(texts)
+
+    texts = list(texts)
+    # A few chunks per worker keeps the pool busy when chunks finish unevenly
+    chunk_size = -(-len(texts) // (workers * 4))
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+
+    # Spawned workers avoid forking the threads of a running Streamlit server
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(matcher,)) as executor:
+        results = []
+        for chunk_result in executor.map(_match_chunk, chunks):
+            results.extend(chunk_result)
+    return results
+
+
+def factorize_concepts(concepts: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """
+    Reduce a column of descriptions to its distinct values.
+
+    Args:
+        concepts (pd.Series): Concepto column
+
+    Returns:
+        Tuple[np.ndarray, List[str]]: (row codes into uniques, distinct descriptions)
+    """
+    codes, uniques = pd.factorize(concepts, use_na_sentinel=True)
+    return codes, list(uniques)
+
+
+def broadcast_categories(codes: np.ndarray, unique_categories: Sequence[str], index: pd.Index,
+                         uncategorized: str = UNCATEGORIZED_CATEGORY) -> pd.Series:
+    """
+    Map per-description categories back to rows with a vectorized take.
+
+    Args:
+        codes (np.ndarray): Row codes from factorize_concepts (-1 for missing)
+        unique_categories (Sequence[str]): Category for each distinct description
+        index (pd.Index): Index of the original rows
+        uncategorized (str): Category for rows without a description
+
+    Returns:
+        pd.Series: Categories aligned with index
+    """
+    # The extra trailing slot catches the -1 sentinel of missing descriptions
+    lookup = np.array(list(unique_categories) + [uncategorized], dtype=object)
+    return pd.Series(lookup.take(codes), index=index, dtype=object)
+
+
+def new_keywords_between(previous: Dict[str, List[str]],
+                         current: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """
+    Find keywords present in current categories but not in previous ones.
+
+    Args:
+        previous (Dict): Categories before the change
+        current (Dict): Categories after the change
+
+    Returns:
+        Dict[str, List[str]]: Category -> newly added keywords (non-empty only)
+    """
+    added = {}
+    for category, keywords in current.items():
+        if category == UNCATEGORIZED_CATEGORY:
+            continue
+        known = {keyword.lower().strip() for keyword in previous.get(category, [])}
+        fresh = [keyword for keyword in keywords
+                 if keyword.strip() and keyword.lower().strip() not in known]
+        if fresh:
+            added[category] = fresh
+    return added
+
+
+def categories_signature(categories: Dict[str, List[str]]) -> str:
+    """
+    Build a stable signature of a categories dictionary.
+
+    Order is preserved on purpose: it decides ties between categories.
+
+    Args:
+        categories (Dict): Category name -> list of keywords
+
+    Returns:
+        str: JSON signature usable as a cache key
+    """
+    return json.dumps(categories, ensure_ascii=False, separators=(",", ":"))
+
+
+def categories_version(categories: Dict[str, List[str]]) -> str:
+    """
+    Short fingerprint of a categories dictionary.
+
+    Stored next to memoized results so they are ignored once keywords change.
+
+    Args:
+        categories (Dict): Category name -> list of keywords
+
+    Returns:
+        str: Hex digest of the categories signature
+    """
+    return hashlib.sha1(categories_signature(categories).encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _compile_matcher(signature: str) -> KeywordMatcher:
+    return KeywordMatcher(json.loads(signature))
+
+
+def get_matcher(categories: Dict[str, List[str]]) -> KeywordMatcher:
+    """
+    Return the compiled matcher for a categories dictionary.
+
+    The automaton is cached by signature and only rebuilt when the
+    categories or their keywords change.
+
+    Args:
+        categories (Dict): Category name -> list of keywords
+
+    Returns:
+        KeywordMatcher: Compiled matcher
+    """
+    return _compile_matcher(categories_signature(categories))
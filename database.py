@@ -5,43 +5,552 @@ Handles SQLite database operations for storing transactions and categories.
 Provides persistent storage while maintaining all existing functionality.
 """
 
+import os
+import queue
 import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 import json
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
-import hashlib
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+
+from merchants import MERCHANT_KEY_VERSION, normalize_merchants
+from categorizer import KeywordMatcher
+
+# The shared transactions frame is handed to every session; copy-on-write
+# lets them derive views from it and lets merges share unchanged columns
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Connection pool defaults
+DEFAULT_POOL_SIZE = 8
+DEFAULT_CACHE_SIZE_KIB = 64 * 1024
+DEFAULT_MMAP_SIZE = 256 * 2 ** 20
+DEFAULT_CACHED_STATEMENTS = 256
+
+# Writes grouped into one commit, and commits kept for latency metrics
+DEFAULT_MAX_WRITE_BATCH = 64
+COMMIT_LATENCY_WINDOW = 100
+
+# SQL expression turning a stored day number into its 'YYYY-MM' month
+MONTH_OF_DAY_SQL = "strftime('%Y-%m', {day} * 86400, 'unixepoch')"
+
+# Public DataFrame columns of a transaction -> stored column
+TRANSACTION_COLUMNS = {
+    'Fecha valor': 'fecha_valor',
+    'Concepto': 'concepto',
+    'Importe': 'importe_cents',
+    'Tipo': 'tipo',
+    'Category': 'category',
+}
+
+# Repetitive text columns loaded as pandas categoricals: integer codes instead
+# of one Python string per row, and comparisons that scan the codes
+CATEGORICAL_COLUMNS = ('Concepto', 'Tipo', 'Category')
+
+# Per-row outcomes reported by FinanceDatabase.import_transactions
+IMPORT_STATUS_NEW = "new"
+IMPORT_STATUS_DUPLICATE = "duplicate"
+IMPORT_STATUS_INVALID = "invalid"
+
+# Fixed 16-byte SipHash key: dedupe keys must stay stable across runs
+DEDUPE_HASH_KEY = "wealthwise-dedup"
+
+TRANSACTIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dedupe_key INTEGER NOT NULL,
+        fecha_valor INTEGER NOT NULL,
+        concepto TEXT NOT NULL,
+        merchant_key TEXT,
+        importe_cents INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        category TEXT NOT NULL,
+        upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_modified TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+        version INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+
+def merge_transaction_changes(df: pd.DataFrame, changes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge a change feed delta into a transactions frame.
+    
+    The input frame is left untouched: known rows are overwritten in a
+    copy-on-write copy, and new rows are added and re-sorted newest first
+    only when there are any.
+    
+    Args:
+        df (pd.DataFrame): Transactions indexed by id, newest first
+        changes (pd.DataFrame): Output of FinanceDatabase.get_changes
+        
+    Returns:
+        pd.DataFrame: Merged frame, newest first
+    """
+    known = changes.index.isin(df.index)
+    df = df.copy(deep=False)
+    changes = changes.copy(deep=False)
+    for column in CATEGORICAL_COLUMNS:
+        # Both sides need the same categories to assign or concatenate codes
+        categories = df[column].cat.categories.union(changes[column].cat.categories)
+        if len(categories) > len(df[column].cat.categories):
+            df[column] = df[column].cat.set_categories(categories)
+        changes[column] = changes[column].cat.set_categories(categories)
+    
+    if known.any():
+        df.loc[changes.index[known], changes.columns] = changes[known]
+    
+    if known.all():
+        return df
+    df = pd.concat([df, changes[~known]])
+    return df.sort_index(ascending=False).sort_values(by='Fecha valor', ascending=False, kind='stable')
+
+
+def build_month_index(dates: pd.Series) -> Dict[int, slice]:
+    """
+    Map each month of a date-sorted column to its contiguous row range.
+    
+    Args:
+        dates (pd.Series): Datetime column sorted newest first
+        
+    Returns:
+        Dict[int, slice]: int32 month code (pd.Period ordinal, months since
+            1970-01) -> positional slice, newest month first
+    """
+    codes = ((dates.dt.year - 1970) * 12 + dates.dt.month - 1).to_numpy(dtype=np.int32)
+    if len(codes) == 0:
+        return {}
+    
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+    stops = np.append(starts[1:], len(codes))
+    return {
+        code: slice(start, stop)
+        for code, start, stop in zip(codes[starts].tolist(), starts.tolist(), stops.tolist())
+    }
+
+
+def to_day_numbers(dates: pd.Series) -> np.ndarray:
+    """
+    Convert datetimes to stored day numbers (days since 1970-01-01).
+    
+    Args:
+        dates (pd.Series): Datetime column
+        
+    Returns:
+        np.ndarray: int64 day numbers
+    """
+    return dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+def from_day_numbers(days: pd.Series) -> pd.Series:
+    """
+    Convert stored day numbers back to datetimes without parsing strings.
+    
+    Args:
+        days (pd.Series): int64 day numbers
+        
+    Returns:
+        pd.Series: datetime64[ns] column aligned with the input index
+    """
+    return pd.Series(days.to_numpy(dtype=np.int64).astype('datetime64[D]').astype('datetime64[ns]'),
+                     index=days.index)
+
+def to_cents(amounts: pd.Series) -> np.ndarray:
+    """
+    Convert euro amounts to stored integer cents.
+    
+    Args:
+        amounts (pd.Series): Amounts in euros
+        
+    Returns:
+        np.ndarray: int64 cents
+    """
+    return np.rint(amounts.to_numpy(dtype=float) * 100).astype(np.int64)
+
+class ConnectionPool:
+    """
+    Bounded pool of long-lived SQLite connections shared by every thread.
+    
+    Streamlit runs each session (and each rerun) on its own thread, so
+    connections are opened with check_same_thread=False and lent to one
+    thread at a time. Each connection keeps its page cache and its cache of
+    prepared statements between uses.
+    """
+    
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE,
+                 cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+                 mmap_size: int = DEFAULT_MMAP_SIZE,
+                 cached_statements: int = DEFAULT_CACHED_STATEMENTS):
+        """
+        Create an empty pool; connections are opened on first use.
+        
+        Args:
+            db_path (str): Path to the SQLite database file
+            size (int): Maximum number of open connections
+            cache_size_kib (int): Page cache per connection, in KiB
+            mmap_size (int): Bytes of the database file to memory-map
+            cached_statements (int): Prepared statements kept per connection
+        """
+        self.db_path = db_path
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        # Most recently returned first, so the warmest connections get reused
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._probe: Optional[sqlite3.Connection] = None
+        self._probe_lock = threading.Lock()
+    
+    def data_version(self) -> int:
+        """
+        Read PRAGMA data_version on a connection that never writes.
+        
+        The value changes whenever any other connection, in this process or
+        another one, commits to the database file.
+        
+        Returns:
+            int: Current data version
+        """
+        with self._probe_lock:
+            if self._probe is None:
+                self._probe = self.open_connection()
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+    
+    def open_connection(self) -> sqlite3.Connection:
+        """
+        Open a tuned connection owned by the pool, for pooled or dedicated use.
+        
+        Returns:
+            sqlite3.Connection: New connection, closed by close()
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a connection for the duration of a with block.
+        
+        Like sqlite3's own connection context manager, the open transaction
+        is committed on success and rolled back on error.
+        
+        Yields:
+            sqlite3.Connection: Connection used only by the calling thread until returned
+        """
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.open_connection()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+    
+    def close(self):
+        """Close every connection opened by the pool."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._idle = queue.LifoQueue()
+        with self._probe_lock:
+            self._probe = None
+
+
+class DatabaseWriter:
+    """
+    Process-wide single writer for one database file.
+    
+    Every mutation is queued to a dedicated thread that owns the only write
+    connection, so concurrent sessions never compete for SQLite's write lock.
+    The thread drains whatever is queued into one transaction (group commit);
+    each write runs in its own savepoint, so a failing write is rolled back
+    without affecting the others in its group. Readers keep using pooled
+    connections, which WAL lets run concurrently with the writer.
+    """
+    
+    def __init__(self, pool: ConnectionPool, max_batch: int = DEFAULT_MAX_WRITE_BATCH):
+        """
+        Start the writer thread.
+        
+        Args:
+            pool (ConnectionPool): Pool whose settings the write connection uses
+            max_batch (int): Maximum writes grouped into one commit
+        """
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._conn = pool.open_connection()
+        # Transactions are managed explicitly by the writer thread
+        self._conn.isolation_level = None
+        self._metrics_lock = threading.Lock()
+        self._commit_seconds: deque = deque(maxlen=COMMIT_LATENCY_WINDOW)
+        self._commits = 0
+        self._writes = 0
+        self._failed_writes = 0
+        self._closed = False
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="finance-db-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, write: Callable[[sqlite3.Cursor], object]) -> Future:
+        """
+        Queue a write.
+        
+        Args:
+            write (Callable): Function run on the writer thread with a cursor
+                inside an open transaction; it must not commit
+                
+        Returns:
+            Future: Resolves to the function's return value once its group is
+                committed, or fails with RuntimeError right away if the writer
+                was closed
+        """
+        future = Future()
+        with self._submit_lock:
+            if self._closed:
+                future.set_exception(RuntimeError("The database writer is closed"))
+            else:
+                self._queue.put((write, future))
+        return future
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._commit(batch)
+                    return
+                batch.append(item)
+            self._commit(batch)
+    
+    def _commit(self, batch: List[Tuple[Callable, Future]]):
+        cursor = self._conn.cursor()
+        results = []
+        start = time.perf_counter()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for write, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor.execute("SAVEPOINT write")
+                try:
+                    results.append((future, write(cursor), None))
+                    cursor.execute("RELEASE write")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write")
+                    cursor.execute("RELEASE write")
+                    results.append((future, None, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            for write, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        
+        failed = sum(1 for _, _, error in results if error is not None)
+        with self._metrics_lock:
+            self._commit_seconds.append(elapsed)
+            self._commits += 1
+            self._writes += len(results) - failed
+            self._failed_writes += failed
+        
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+    
+    @property
+    def generation(self) -> int:
+        """Number of committed write groups; changes whenever this process writes."""
+        with self._metrics_lock:
+            return self._commits
+    
+    def metrics(self) -> Dict[str, float]:
+        """
+        Report queue depth and group-commit statistics.
+        
+        Returns:
+            Dict[str, float]: queue_depth, commits, writes, failed_writes,
+                writes_per_commit, and last/avg/max commit latency in ms over
+                the last COMMIT_LATENCY_WINDOW commits
+        """
+        with self._metrics_lock:
+            latencies = list(self._commit_seconds)
+            commits, writes, failed = self._commits, self._writes, self._failed_writes
+        return {
+            'queue_depth': self._queue.qsize(),
+            'commits': commits,
+            'writes': writes,
+            'failed_writes': failed,
+            'writes_per_commit': (writes + failed) / commits if commits else 0.0,
+            'last_commit_ms': latencies[-1] * 1000 if latencies else 0.0,
+            'avg_commit_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            'max_commit_ms': max(latencies) * 1000 if latencies else 0.0,
+        }
+    
+    def close(self):
+        """Finish the queued writes and stop the thread; later submits fail."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+
+# One pool, writer and schema setup per database file per process, kept
+# until the last FinanceDatabase using the file is closed
+_pools: Dict[str, ConnectionPool] = {}
+_writers: Dict[str, DatabaseWriter] = {}
+_references: Dict[str, int] = {}
+_schema_ready: Dict[str, bool] = {}
+_registry_lock = threading.Lock()
+_schema_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str, **settings) -> ConnectionPool:
+    """
+    Return the process-wide connection pool for a database file.
+    
+    Every call takes a reference on the file, given back with release_database.
+    
+    Args:
+        db_path (str): Path to the SQLite database file
+        **settings: ConnectionPool settings, used when the pool is first created
+        
+    Returns:
+        ConnectionPool: Pool shared by every FinanceDatabase on that file
+    """
+    key = os.path.abspath(db_path)
+    with _registry_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path, **settings)
+        _references[key] = _references.get(key, 0) + 1
+        return pool
+
+
+def get_writer(pool: ConnectionPool) -> DatabaseWriter:
+    """
+    Return the process-wide writer for a pool's database file.
+    
+    Args:
+        pool (ConnectionPool): Pool of the database file
+        
+    Returns:
+        DatabaseWriter: Running writer shared by every FinanceDatabase on that file
+    """
+    key = os.path.abspath(pool.db_path)
+    with _registry_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = DatabaseWriter(pool)
+        return writer
+
+
+def release_database(db_path: str):
+    """
+    Give back a reference taken by get_connection_pool.
+    
+    The last reference on a file stops its writer and closes its pool, so
+    the next FinanceDatabase on it starts afresh.
+    
+    Args:
+        db_path (str): Path to the SQLite database file
+    """
+    key = os.path.abspath(db_path)
+    with _registry_lock:
+        _references[key] -= 1
+        if _references[key] > 0:
+            return
+        del _references[key]
+        writer = _writers.pop(key, None)
+        pool = _pools.pop(key)
+    with _schema_lock:
+        _schema_ready.pop(key, None)
+    
+    if writer is not None:
+        writer.close()
+    pool.close()
+
 
 class FinanceDatabase:
-    def __init__(self, db_path: str = "finance_data.db"):
+    def __init__(self, db_path: str = "finance_data.db", **pool_settings):
         """
         Initialize the database connection and create tables if they don't exist.
         
+        Instances on the same file share one connection pool, and the schema
+        is only set up by the first of them in the process.
+        
         Args:
             db_path (str): Path to the SQLite database file
+            **pool_settings: size, cache_size_kib, mmap_size and cached_statements
+                for the connection pool (see ConnectionPool)
         """
         self.db_path = db_path
+        self.pool = get_connection_pool(db_path, **pool_settings)
         self.init_database()
+        self.writer = get_writer(self.pool)
+        self._stats_lock = threading.Lock()
+        self._stats_cache: Optional[Tuple[tuple, Dict]] = None
+        self._frame_lock = threading.Lock()
+        self._frame_cache: Optional[Tuple[tuple, int, pd.DataFrame, Dict[int, slice]]] = None
+        self._closed = False
+    
+    def connection(self):
+        """Borrow a pooled connection; see ConnectionPool.connection."""
+        return self.pool.connection()
     
     def init_database(self):
-        """Create database tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Create database tables if they don't exist, once per process."""
+        key = os.path.abspath(self.db_path)
+        with _schema_lock:
+            if key in _schema_ready:
+                self.fts_enabled = _schema_ready[key]
+                return
+            self._create_schema()
+            _schema_ready[key] = self.fts_enabled
+    
+    def _create_schema(self):
+        with self.connection() as conn:
             cursor = conn.cursor()
             
             # Create transactions table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    transaction_hash TEXT UNIQUE NOT NULL,
-                    fecha_valor DATE NOT NULL,
-                    concepto TEXT NOT NULL,
-                    importe REAL NOT NULL,
-                    tipo TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            cursor.execute(TRANSACTIONS_TABLE_SQL.format(table="transactions"))
             
             # Create categories table for tracking category changes
             cursor.execute("""
@@ -54,54 +563,481 @@ class FinanceDatabase:
                 )
             """)
             
+            # Create memo table of merchant -> category results per keyword set
+            cursor.execute("DROP TABLE IF EXISTS concept_categories")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS merchant_categories (
+                    merchant_key TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    rules_version TEXT NOT NULL,
+                    last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Create table of uploaded files already imported, by content hash
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS imported_files (
+                    fingerprint TEXT PRIMARY KEY,
+                    file_name TEXT,
+                    row_count INTEGER NOT NULL,
+                    new_count INTEGER NOT NULL,
+                    duplicate_count INTEGER NOT NULL,
+                    imported_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Bring older transactions tables up to the current schema
+            self._migrate_merchant_keys(cursor)
+            self._migrate_transactions_table(cursor)
+            self._migrate_last_modified(cursor)
+            self._init_change_versions(cursor)
+            
             # Create index for faster lookups
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_transaction_hash 
-                ON transactions(transaction_hash)
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_dedupe_key 
+                ON transactions(dedupe_key)
             """)
             
+            # Composite indexes for load_transactions: date range first, or
+            # category equality followed by the date range. Type filters use
+            # the date index too, so a (tipo, fecha_valor) index would only
+            # slow imports down
+            cursor.execute("DROP INDEX IF EXISTS idx_fecha_valor")
+            cursor.execute("DROP INDEX IF EXISTS idx_tipo_fecha")
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_fecha_valor 
-                ON transactions(fecha_valor)
+                CREATE INDEX IF NOT EXISTS idx_fecha_tipo_category 
+                ON transactions(fecha_valor, tipo, category)
             """)
             
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_category_fecha 
+                ON transactions(category, fecha_valor)
+            """)
+            
+            # Concept lookups go through the FTS index, updates through merchant keys
+            cursor.execute("DROP INDEX IF EXISTS idx_concepto")
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_merchant_key 
+                ON transactions(merchant_key)
+            """)
+            
+            # The change feed reads rows past a version watermark
+            cursor.execute("DROP INDEX IF EXISTS idx_last_modified")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_version 
+                ON transactions(version)
+            """)
+            
+            self.fts_enabled = self._init_concept_index(cursor)
+            self._init_monthly_totals(cursor)
+            
             conn.commit()
             print("✅ Database initialized successfully")
     
-    def generate_transaction_hash(self, fecha_valor: str, concepto: str, importe: float) -> str:
+    def _migrate_merchant_keys(self, cursor):
+        """
+        Add the merchant_key column to older databases and backfill missing keys.
+        
+        PRAGMA user_version records the MERCHANT_KEY_VERSION stored keys were
+        derived with; when the normalization rules change, every key is
+        recomputed and the merchant memo, keyed by the old keys, is cleared.
+        """
+        cursor.execute("PRAGMA table_info(transactions)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'merchant_key' not in columns:
+            cursor.execute("ALTER TABLE transactions ADD COLUMN merchant_key TEXT")
+            print("🔧 Added merchant_key column to transactions")
+        
+        cursor.execute("PRAGMA user_version")
+        outdated = cursor.fetchone()[0] < MERCHANT_KEY_VERSION
+        
+        cursor.execute(f"""
+            SELECT id, concepto, merchant_key FROM transactions
+            {"" if outdated else "WHERE merchant_key IS NULL"}
+        """)
+        rows = cursor.fetchall()
+        if rows:
+            ids, concepts, stored_keys = zip(*rows)
+            merchant_keys = normalize_merchants(pd.Series(concepts, dtype=object)).tolist()
+            changed = [
+                (merchant_key, transaction_id)
+                for transaction_id, merchant_key, stored_key in zip(ids, merchant_keys, stored_keys)
+                if merchant_key != stored_key
+            ]
+            cursor.executemany("UPDATE transactions SET merchant_key = ? WHERE id = ?", changed)
+            if changed:
+                print(f"🔧 Recomputed merchant keys for {len(changed)} transactions")
+        
+        if outdated:
+            cursor.execute("DELETE FROM merchant_categories")
+            cursor.execute(f"PRAGMA user_version = {MERCHANT_KEY_VERSION}")
+    
+    def _migrate_transactions_table(self, cursor):
+        """
+        Rebuild transactions tables created with an older schema.
+        
+        Older databases identify rows by a SHA-256 transaction_hash column and
+        store importe as REAL euros and fecha_valor as date text. SQLite can't
+        drop a UNIQUE column or change a column type in place, so the table is
+        rebuilt with the same ids and timestamps, dedupe keys computed in bulk,
+        amounts in integer cents and dates as day numbers.
+        
+        Old rows whose hashes differed only in date or amount formatting get
+        the same dedupe key. Only the first of them stays in transactions; the
+        others are moved to migration_collisions, with the id of the row they
+        collided with, and listed in the log.
+        """
+        cursor.execute("PRAGMA table_info(transactions)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'transaction_hash' not in columns and 'importe' not in columns:
+            return
+        
+        print("🔧 Migrating transactions to dedupe keys, integer cents and day numbers...")
+        existing = pd.read_sql_query("""
+            SELECT id, fecha_valor, concepto, merchant_key, importe, tipo, category,
+                   upload_date, last_modified
+            FROM transactions
+            ORDER BY id
+        """, cursor.connection)
+        dates = pd.to_datetime(existing['fecha_valor'], format='ISO8601')
+        existing['dedupe_key'] = self.generate_dedupe_keys(pd.DataFrame({
+            'Fecha valor': dates,
+            'Concepto': existing['concepto'],
+            'Importe': existing['importe']
+        }))
+        existing['fecha_valor'] = to_day_numbers(dates)
+        existing['importe_cents'] = to_cents(existing['importe'])
+        seconds_only = existing['last_modified'].notna() & ~existing['last_modified'].astype(str).str.contains('.', regex=False)
+        existing.loc[seconds_only, 'last_modified'] = existing.loc[seconds_only, 'last_modified'].astype(str) + '.000'
+        
+        cursor.execute("DROP TABLE IF EXISTS transactions_migrated")
+        cursor.execute(TRANSACTIONS_TABLE_SQL.format(table="transactions_migrated"))
+        columns = ['id', 'dedupe_key', 'fecha_valor', 'concepto', 'merchant_key', 'importe_cents',
+                   'tipo', 'category', 'upload_date', 'last_modified']
+        colliding = existing['dedupe_key'].duplicated()
+        kept = existing[~colliding]
+        cursor.executemany(f"""
+            INSERT INTO transactions_migrated ({", ".join(columns)})
+            VALUES ({", ".join("?" * len(columns))})
+        """, kept[columns].astype(object).itertuples(index=False, name=None))
+        
+        if colliding.any():
+            collisions = existing[colliding].assign(
+                kept_id=existing[colliding]['dedupe_key'].map(
+                    pd.Series(kept['id'].to_numpy(), index=kept['dedupe_key'].to_numpy())
+                )
+            )
+            cursor.execute(TRANSACTIONS_TABLE_SQL.format(table="migration_collisions"))
+            cursor.execute("PRAGMA table_info(migration_collisions)")
+            if 'kept_id' not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE migration_collisions ADD COLUMN kept_id INTEGER")
+            cursor.executemany(f"""
+                INSERT INTO migration_collisions ({", ".join(columns)}, kept_id)
+                VALUES ({", ".join("?" * (len(columns) + 1))})
+            """, collisions[columns + ['kept_id']].astype(object).itertuples(index=False, name=None))
+            
+            print(f"⚠️ {len(collisions)} transactions duplicate another row once their dedupe key is "
+                  f"recomputed; moved to migration_collisions:")
+            for row in collisions.itertuples():
+                print(f"   id {row.id} ({pd.Timestamp(row.fecha_valor, unit='D').date()}, "
+                      f"{row.concepto!r}, {row.importe}) "
+                      f"duplicates id {row.kept_id}")
+        
+        # Dropping the table also drops its indexes and the FTS triggers;
+        # init_database recreates them on the new table
+        cursor.execute("DROP TABLE transactions")
+        cursor.execute("ALTER TABLE transactions_migrated RENAME TO transactions")
+        print(f"🔧 Migrated {len(existing)} transactions: {len(kept)} kept, "
+              f"{int(colliding.sum())} moved to migration_collisions")
+    
+    def _migrate_last_modified(self, cursor):
+        """
+        Rebuild transactions tables whose last_modified default has second precision.
+        
+        last_modified is compared as text against watermarks, so every write
+        must use the same 'YYYY-MM-DD HH:MM:SS.SSS' format: a row inserted as
+        '...:05' would sort below an update stamped '...:05.500' earlier in
+        that second. SQLite can't change a column default in place, so the
+        table is copied with the same ids and existing values are padded to
+        milliseconds.
+        """
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'transactions'")
+        if "%H:%M:%f" in cursor.fetchone()[0]:
+            return
+        
+        columns = ", ".join(['id', 'dedupe_key', 'fecha_valor', 'concepto', 'merchant_key',
+                             'importe_cents', 'tipo', 'category', 'upload_date'])
+        cursor.execute("DROP TABLE IF EXISTS transactions_migrated")
+        cursor.execute(TRANSACTIONS_TABLE_SQL.format(table="transactions_migrated"))
+        cursor.execute(f"""
+            INSERT INTO transactions_migrated ({columns}, last_modified)
+            SELECT {columns},
+                   CASE WHEN last_modified LIKE '%.%' THEN last_modified
+                        ELSE last_modified || '.000' END
+            FROM transactions
+        """)
+        migrated_count = cursor.rowcount
+        cursor.execute("DROP TABLE transactions")
+        cursor.execute("ALTER TABLE transactions_migrated RENAME TO transactions")
+        print(f"🔧 Migrated last_modified of {migrated_count} transactions to millisecond precision")
+    
+    def _init_change_versions(self, cursor):
+        """
+        Add the per-row version column and the counter that hands versions out.
+        
+        change_counter holds the last version assigned. Writes bump it inside
+        their transaction (see _next_version), so versions only grow, commit
+        in order and don't depend on the clock; rows stored before versions
+        existed keep version 0.
+        """
+        cursor.execute("PRAGMA table_info(transactions)")
+        if 'version' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE transactions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        
+        cursor.execute("CREATE TABLE IF NOT EXISTS change_counter (version INTEGER NOT NULL)")
+        cursor.execute("""
+            INSERT INTO change_counter (version)
+            SELECT COALESCE((SELECT MAX(version) FROM transactions), 0)
+            WHERE NOT EXISTS (SELECT 1 FROM change_counter)
+        """)
+    
+    @staticmethod
+    def _next_version(cursor) -> int:
+        """Assign the version stamped on every row a write inserts or modifies."""
+        cursor.execute("UPDATE change_counter SET version = version + 1")
+        cursor.execute("SELECT version FROM change_counter")
+        return cursor.fetchone()[0]
+    
+    def _init_monthly_totals(self, cursor):
+        """
+        Create the monthly_category_totals table and the triggers maintaining it.
+        
+        Every insert, delete and update of a transaction's date, type, category
+        or amount adjusts the (month, category, tipo) row it falls in, so
+        summaries read a few pre-aggregated rows instead of the full history.
+        The table is filled from existing transactions when first created.
+        """
+        cursor.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'monthly_category_totals'
+        """)
+        exists = cursor.fetchone() is not None
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS monthly_category_totals (
+                month TEXT NOT NULL,
+                category TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                total_cents INTEGER NOT NULL,
+                transaction_count INTEGER NOT NULL,
+                PRIMARY KEY (month, category, tipo)
+            ) WITHOUT ROWID
+        """)
+        
+        add_new = f"""
+            INSERT INTO monthly_category_totals (month, category, tipo, total_cents, transaction_count)
+            VALUES ({MONTH_OF_DAY_SQL.format(day="new.fecha_valor")}, new.category, new.tipo, new.importe_cents, 1)
+            ON CONFLICT (month, category, tipo) DO UPDATE SET
+                total_cents = total_cents + excluded.total_cents,
+                transaction_count = transaction_count + 1;
+        """
+        remove_old = f"""
+            UPDATE monthly_category_totals
+            SET total_cents = total_cents - old.importe_cents,
+                transaction_count = transaction_count - 1
+            WHERE month = {MONTH_OF_DAY_SQL.format(day="old.fecha_valor")}
+              AND category = old.category AND tipo = old.tipo;
+            DELETE FROM monthly_category_totals WHERE transaction_count <= 0;
+        """
+        # One execute per trigger: executescript would commit the open
+        # transaction first, so a failure could leave the schema half set up
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS monthly_totals_insert AFTER INSERT ON transactions BEGIN
+                {add_new}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS monthly_totals_delete AFTER DELETE ON transactions BEGIN
+                {remove_old}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS monthly_totals_update
+            AFTER UPDATE OF fecha_valor, category, tipo, importe_cents ON transactions BEGIN
+                {remove_old}
+                {add_new}
+            END
+        """)
+        
+        if not exists:
+            cursor.execute(f"""
+                INSERT INTO monthly_category_totals (month, category, tipo, total_cents, transaction_count)
+                SELECT {MONTH_OF_DAY_SQL.format(day="fecha_valor")} AS month, category, tipo,
+                       SUM(importe_cents), COUNT(*)
+                FROM transactions
+                GROUP BY month, category, tipo
+            """)
+    
+    def _init_concept_index(self, cursor) -> bool:
         """
-        Generate a unique hash for a transaction to detect duplicates.
+        Create the FTS5 trigram index over transaction concepts and merchant keys.
+        
+        The index is an external-content table, so substring searches and
+        keyword lookups don't scan the whole table. Triggers keep it in sync on
+        update and delete only: a per-row insert trigger made large imports
+        several times slower, so import_transactions indexes its new rows in
+        one bulk statement. Any other code that inserts transactions must
+        index its rows the same way, or searches will not find them.
+        
+        Returns:
+            bool: True if FTS5 is available, False to fall back to table scans
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+        )
+        already_exists = cursor.fetchone() is not None
+        
+        if already_exists:
+            # Recreate indexes built before merchant keys were indexed too
+            cursor.execute("PRAGMA table_info(transactions_fts)")
+            if 'merchant_key' not in {row[1] for row in cursor.fetchall()}:
+                for trigger in ('insert', 'delete', 'update'):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS transactions_fts_{trigger}")
+                cursor.execute("DROP TABLE transactions_fts")
+                already_exists = False
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+                    concepto,
+                    merchant_key,
+                    content='transactions',
+                    content_rowid='id',
+                    tokenize='trigram'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ FTS5 not available, concept search will scan the table: {e}")
+            return False
+        
+        cursor.execute("DROP TRIGGER IF EXISTS transactions_fts_insert")
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+                INSERT INTO transactions_fts(transactions_fts, rowid, concepto, merchant_key)
+                VALUES ('delete', old.id, old.concepto, old.merchant_key);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_update
+            AFTER UPDATE OF concepto, merchant_key ON transactions BEGIN
+                INSERT INTO transactions_fts(transactions_fts, rowid, concepto, merchant_key)
+                VALUES ('delete', old.id, old.concepto, old.merchant_key);
+                INSERT INTO transactions_fts(rowid, concepto, merchant_key)
+                VALUES (new.id, new.concepto, new.merchant_key);
+            END
+        """)
+        
+        if not already_exists:
+            # Index transactions stored before the FTS table existed
+            cursor.execute("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+        
+        return True
+    
+    @staticmethod
+    def _fts_phrase(term: str) -> str:
+        """Quote a search term as a literal FTS5 phrase."""
+        return '"' + term.replace('"', '""') + '"'
+    
+    def _concept_filter(self, terms: List[str], column: str = 'concepto') -> Tuple[str, list]:
+        """
+        Build a WHERE clause on transactions whose column contains any of the terms.
+        
+        Uses the trigram index for terms of three or more characters (the
+        shortest the trigram tokenizer can index) and a scan otherwise.
         
         Args:
-            fecha_valor (str): Transaction date
+            terms (List[str]): Case-insensitive substrings to look for
+            column (str): 'concepto' or 'merchant_key'
+            
+        Returns:
+            Tuple[str, list]: (SQL condition, parameters)
+        """
+        indexed = [term for term in terms if len(term) >= 3] if self.fts_enabled else []
+        scanned = [term for term in terms if term not in indexed]
+        
+        conditions = []
+        params = []
+        if indexed:
+            conditions.append(
+                "id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)"
+            )
+            phrases = " OR ".join(self._fts_phrase(term) for term in indexed)
+            params.append(f"{column} : ({phrases})")
+        for term in scanned:
+            conditions.append(f"instr(lower({column}), ?) > 0")
+            params.append(term.lower())
+        
+        return " OR ".join(conditions) or "0", params
+    
+    def generate_dedupe_key(self, fecha_valor: str, concepto: str, importe: float) -> int:
+        """
+        Generate a unique key for a transaction to detect duplicates.
+        
+        Args:
+            fecha_valor (str): Transaction date (YYYY-MM-DD)
             concepto (str): Transaction description
             importe (float): Transaction amount
             
         Returns:
-            str: SHA-256 hash of the transaction
+            int: Signed 64-bit dedupe key
         """
-        # Normalize the data for consistent hashing
-        normalized_data = f"{fecha_valor}|{concepto.strip()}|{abs(importe):.2f}"
-        return hashlib.sha256(normalized_data.encode('utf-8')).hexdigest()
+        return int(self.generate_dedupe_keys(pd.DataFrame({
+            'Fecha valor': pd.to_datetime([fecha_valor]),
+            'Concepto': [concepto],
+            'Importe': [importe]
+        })).iloc[0])
     
-    def transaction_exists(self, transaction_hash: str) -> bool:
+    def transaction_exists(self, dedupe_key: int) -> bool:
         """
         Check if a transaction already exists in the database.
         
         Args:
-            transaction_hash (str): Hash of the transaction
+            dedupe_key (int): Dedupe key of the transaction
             
         Returns:
             bool: True if transaction exists, False otherwise
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT COUNT(*) FROM transactions WHERE transaction_hash = ?",
-                (transaction_hash,)
+                "SELECT COUNT(*) FROM transactions WHERE dedupe_key = ?",
+                (dedupe_key,)
             )
             return cursor.fetchone()[0] > 0
     
+    def generate_dedupe_keys(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Generate duplicate-detection keys for a whole DataFrame.
+        
+        The date, stripped concept and absolute amount are joined column-wise
+        and hashed with pandas' vectorized SipHash into one 8-byte integer per
+        row, which keeps the unique index small.
+        
+        Args:
+            df (pd.DataFrame): DataFrame with 'Fecha valor', 'Concepto' and 'Importe'
+            
+        Returns:
+            pd.Series: Signed 64-bit dedupe key per row
+        """
+        normalized = (
+            df['Fecha valor'].dt.strftime('%Y-%m-%d') + "|"
+            + df['Concepto'].astype(str).str.strip() + "|"
+            + df['Importe'].abs().map('{:.2f}'.format)
+        ).astype(object)
+        hashed = pd.util.hash_pandas_object(normalized, index=False, hash_key=DEDUPE_HASH_KEY)
+        # SQLite integers are signed, so reinterpret the unsigned hash bits
+        return pd.Series(hashed.to_numpy().view('int64'), index=df.index)
+    
     def insert_transactions(self, df: pd.DataFrame) -> Tuple[int, int]:
         """
         Insert new transactions into the database, skipping duplicates.
@@ -110,121 +1046,533 @@ class FinanceDatabase:
             df (pd.DataFrame): DataFrame with transaction data
             
         Returns:
-            Tuple[int, int]: (new_transactions_added, duplicates_skipped)
+            Tuple[int, int]: (new_transactions_added, duplicates_skipped).
+                Invalid rows are counted with the duplicates.
+        """
+        report = self.import_transactions(df)
+        new_count = int((report['Status'] == IMPORT_STATUS_NEW).sum())
+        return new_count, len(report) - new_count
+    
+    def import_transactions(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        new_count = 0
-        duplicate_count = 0
+        Bulk-import transactions and report what happened to every input row.
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        The batch is loaded into a TEMP staging table and duplicates are found
+        with one anti-join against the unique dedupe_key index, so only new
+        rows are inserted, in a single INSERT ... SELECT. Rows repeating an
+        earlier row of the same batch are duplicates too. Rows missing a date,
+        concept, amount, type or category are invalid and never staged.
+        
+        Args:
+            df (pd.DataFrame): DataFrame with transaction data
             
-            for _, row in df.iterrows():
-                try:
-                    # Generate hash for duplicate detection
-                    transaction_hash = self.generate_transaction_hash(
-                        row['Fecha valor'].strftime('%Y-%m-%d'),
-                        row['Concepto'],
-                        row['Importe']
-                    )
-                    
-                    # Use INSERT OR IGNORE to handle duplicates gracefully
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO transactions 
-                        (transaction_hash, fecha_valor, concepto, importe, tipo, category)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (
-                        transaction_hash,
-                        row['Fecha valor'].strftime('%Y-%m-%d'),
-                        row['Concepto'],
-                        row['Importe'],
-                        row['Tipo'],
-                        row['Category']
-                    ))
-                    
-                    # Check if the row was actually inserted
-                    if cursor.rowcount > 0:
-                        new_count += 1
-                        print(f"✅ Added: {row['Concepto'][:50]}...")
-                    else:
-                        duplicate_count += 1
-                        print(f"⏭️  Skipping duplicate: {row['Concepto'][:50]}...")
-                        
-                except Exception as e:
-                    print(f"❌ Error inserting transaction: {e}")
-                    print(f"   Transaction: {row['Concepto'][:50]}...")
-                    duplicate_count += 1
-                    continue
+        Returns:
+            pd.DataFrame: Indexed like df, with 'Status' ('new', 'duplicate'
+                or 'invalid') and 'Transaction ID' (id of the inserted row, or
+                of the stored row it duplicates)
+        """
+        report = pd.DataFrame({
+            'Status': IMPORT_STATUS_INVALID,
+            'Transaction ID': pd.Series(pd.NA, index=df.index, dtype='Int64')
+        }, index=df.index)
+        
+        valid = df[['Fecha valor', 'Concepto', 'Importe', 'Tipo', 'Category']].notna().all(axis=1)
+        invalid_count = int((~valid).sum())
+        if invalid_count:
+            print(f"❌ Skipping {invalid_count} transactions with missing fields")
+        df = df[valid]
+        
+        if df.empty:
+            return report
+        
+        # Reuse merchant keys from the categorization stage when available
+        if 'Merchant' in df.columns:
+            merchant_keys = df['Merchant']
+        else:
+            merchant_keys = normalize_merchants(df['Concepto'])
+        
+        dedupe_keys = self.generate_dedupe_keys(df)
+        # Only the first row of each key is staged; repeats are batch duplicates
+        first = ~dedupe_keys.duplicated()
+        positions = np.flatnonzero(first.to_numpy())
+        staged = df[first]
+        rows = zip(
+            positions.tolist(),
+            dedupe_keys[first].tolist(),
+            to_day_numbers(staged['Fecha valor']).tolist(),
+            staged['Concepto'].tolist(),
+            merchant_keys[first].tolist(),
+            to_cents(staged['Importe']).tolist(),
+            staged['Tipo'].tolist(),
+            staged['Category'].tolist()
+        )
+        
+        def write(cursor):
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS import_staging (
+                    position INTEGER PRIMARY KEY,
+                    dedupe_key INTEGER NOT NULL,
+                    fecha_valor INTEGER NOT NULL,
+                    concepto TEXT NOT NULL,
+                    merchant_key TEXT,
+                    importe_cents INTEGER NOT NULL,
+                    tipo TEXT NOT NULL,
+                    category TEXT NOT NULL
+                )
+            """)
+            cursor.execute("DELETE FROM import_staging")
+            cursor.executemany("""
+                INSERT INTO import_staging
+                (position, dedupe_key, fecha_valor, concepto, merchant_key, importe_cents, tipo, category)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
             
-            conn.commit()
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM transactions")
+            last_id = cursor.fetchone()[0]
+            
+            # Anti-join: insert staged rows whose key is not stored yet, in file order
+            cursor.execute("""
+                INSERT INTO transactions
+                (dedupe_key, fecha_valor, concepto, merchant_key, importe_cents, tipo, category, version)
+                SELECT s.dedupe_key, s.fecha_valor, s.concepto, s.merchant_key,
+                       s.importe_cents, s.tipo, s.category, ?
+                FROM import_staging s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM transactions t WHERE t.dedupe_key = s.dedupe_key
+                )
+                ORDER BY s.position
+            """, (self._next_version(cursor),))
+            new_count = cursor.rowcount
+            
+            # Index the new rows for concept search in one statement
+            if self.fts_enabled and new_count:
+                cursor.execute("""
+                    INSERT INTO transactions_fts(rowid, concepto, merchant_key)
+                    SELECT id, concepto, merchant_key FROM transactions WHERE id > ?
+                """, (last_id,))
+            
+            stored = pd.read_sql_query("""
+                SELECT s.dedupe_key, t.id
+                FROM import_staging s
+                JOIN transactions t ON t.dedupe_key = s.dedupe_key
+            """, cursor.connection)
+            cursor.execute("DELETE FROM import_staging")
+            return new_count, last_id, stored
         
-        return new_count, duplicate_count
+        new_count, last_id, stored = self.writer.submit(write).result()
+        ids = dedupe_keys.map(pd.Series(stored['id'].to_numpy(), index=stored['dedupe_key']))
+        is_new = pd.Series(False, index=df.index)
+        is_new[first] = ids[first].to_numpy() > last_id
+        report.loc[df.index, 'Transaction ID'] = ids.astype('Int64')
+        report.loc[df.index, 'Status'] = np.where(is_new, IMPORT_STATUS_NEW, IMPORT_STATUS_DUPLICATE)
+        
+        duplicate_count = len(df) - new_count
+        print(f"✅ Inserted {new_count} new transactions, skipped {duplicate_count} duplicates"
+              f" and {invalid_count} invalid")
+        return report
     
     def load_all_transactions(self) -> pd.DataFrame:
         """
         Load all transactions from the database.
         
         Returns:
-            pd.DataFrame: All transactions with proper data types
+            pd.DataFrame: All transactions with proper data types, indexed by
+                transaction id
+        """
+        return self.load_transactions()
+    
+    def _transaction_filter(self, start=None, end=None, tipo: Optional[str] = None,
+                            categories: Optional[List[str]] = None,
+                            search_term: Optional[str] = None) -> Tuple[str, list]:
+        """
+        Build the WHERE clause shared by load_transactions and count_transactions.
+        
+        Returns:
+            Tuple[str, list]: ('WHERE ...' or an empty string, parameters)
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("fecha_valor >= ?")
+            params.append(int(to_day_numbers(pd.Series([pd.Timestamp(start)]))[0]))
+        if end is not None:
+            conditions.append("fecha_valor < ?")
+            params.append(int(to_day_numbers(pd.Series([pd.Timestamp(end)]))[0]))
+        if tipo is not None:
+            conditions.append("tipo = ?")
+            params.append(tipo)
+        if categories is not None:
+            conditions.append(f"category IN ({', '.join('?' * len(categories))})" if categories else "0")
+            params.extend(categories)
+        if search_term and search_term.strip():
+            condition, search_params = self._concept_filter([search_term.strip()])
+            conditions.append(f"({condition})")
+            params.extend(search_params)
+        
+        return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+    
+    def load_transactions(self, start=None, end=None, tipo: Optional[str] = None,
+                          categories: Optional[List[str]] = None,
+                          columns: Optional[List[str]] = None,
+                          limit: Optional[int] = None, offset: Optional[int] = None,
+                          search_term: Optional[str] = None,
+                          order_by: str = 'Fecha valor', descending: bool = True) -> pd.DataFrame:
+        """
+        Load the transactions matching a date range, type and categories.
+        
+        Every predicate runs in SQL against the composite indexes, so only
+        matching rows and requested columns are read. Dates and amounts are
+        stored as integers and converted to 'Fecha valor' datetimes and
+        'Importe' euros without parsing text; 'Concepto', 'Tipo' and
+        'Category' are returned as categoricals.
+        
+        Args:
+            start (date-like, optional): First date included
+            end (date-like, optional): First date excluded
+            tipo (str, optional): 'Debit' or 'Credit'
+            categories (List[str], optional): Categories to include
+            columns (List[str], optional): Subset of 'Fecha valor', 'Concepto',
+                'Importe', 'Tipo' and 'Category'; all of them by default
+            limit (int, optional): Maximum number of rows
+            offset (int, optional): Rows to skip in the sort order
+            search_term (str, optional): Case-insensitive text the concept must contain
+            order_by (str): Column to sort by; ties are broken by transaction id
+            descending (bool): Sort direction, newest first by default
+            
+        Returns:
+            pd.DataFrame: Matching transactions in the sort order, indexed by transaction id
+        """
+        columns = list(columns or TRANSACTION_COLUMNS)
+        unknown = [column for column in columns + [order_by] if column not in TRANSACTION_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown transaction columns: {unknown}")
+        
+        where, params = self._transaction_filter(start, end, tipo, categories, search_term)
+        direction = "DESC" if descending else "ASC"
+        query = f"""
+            SELECT id, {", ".join(TRANSACTION_COLUMNS[column] for column in columns)}
+            FROM transactions
+            {where}
+            ORDER BY {TRANSACTION_COLUMNS[order_by]} {direction}, id {direction}
+        """
+        if limit is not None or offset is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else int(limit), int(offset or 0)])
+        
+        with self.connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params, index_col='id')
+        return self._to_public_columns(df)[columns]
+    
+    def count_transactions(self, start=None, end=None, tipo: Optional[str] = None,
+                           categories: Optional[List[str]] = None,
+                           search_term: Optional[str] = None) -> int:
+        """
+        Count the transactions load_transactions would return without a limit.
+        
+        Args:
+            start, end, tipo, categories, search_term: As in load_transactions
+            
+        Returns:
+            int: Number of matching transactions
+        """
+        where, params = self._transaction_filter(start, end, tipo, categories, search_term)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM transactions {where}", params)
+            return cursor.fetchone()[0]
+    
+    @staticmethod
+    def _to_public_columns(df: pd.DataFrame) -> pd.DataFrame:
+        """Rename stored transaction columns and convert day numbers, cents and categoricals."""
+        df = df.rename(columns={stored: column for column, stored in TRANSACTION_COLUMNS.items()})
+        for column in CATEGORICAL_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype('category')
+        if 'Fecha valor' in df.columns:
+            df['Fecha valor'] = from_day_numbers(df['Fecha valor'])
+        if 'Importe' in df.columns:
+            # An empty result comes back as object; cast so it is float64 too
+            df['Importe'] = df['Importe'].astype(np.int64) / 100
+        return df
+    
+    def get_change_watermark(self) -> int:
         """
-        with sqlite3.connect(self.db_path) as conn:
-            query = """
-                SELECT fecha_valor, concepto, importe, tipo, category
+        Get the current position of the change feed.
+        
+        Read it before loading a frame, then pass it to get_changes: anything
+        written in between shows up in the next delta.
+        
+        Returns:
+            int: Last version assigned to a write
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM change_counter")
+            return cursor.fetchone()[0]
+    
+    def get_changes(self, watermark: int) -> Tuple[pd.DataFrame, int]:
+        """
+        Read the transactions inserted or modified since a watermark.
+        
+        Every write stamps the rows it inserts or modifies with a version
+        taken from change_counter while it holds the write lock, so a later
+        commit always carries a higher version than anything already visible;
+        unlike timestamps this holds across clock changes and same-millisecond
+        writes. Deleted transactions are not reported.
+        
+        Args:
+            watermark (int): From get_change_watermark or a previous call
+            
+        Returns:
+            Tuple[pd.DataFrame, int]: (changed rows in the shape of
+                load_transactions, watermark for the next call)
+        """
+        with self.connection() as conn:
+            df = pd.read_sql_query(f"""
+                SELECT id, {", ".join(TRANSACTION_COLUMNS.values())}, version
                 FROM transactions
-                ORDER BY fecha_valor DESC
-            """
-            df = pd.read_sql_query(query, conn)
-            
-            if not df.empty:
-                # Convert data types to match the original format
-                df['Fecha valor'] = pd.to_datetime(df['fecha_valor'])
-                df['Concepto'] = df['concepto']
-                df['Importe'] = df['importe'].astype(float)
-                df['Tipo'] = df['tipo']
-                df['Category'] = df['category']
-                
-                # Drop the original column names and keep the formatted ones
-                df = df[['Fecha valor', 'Concepto', 'Importe', 'Tipo', 'Category']]
+                WHERE version > ?
+            """, conn, params=(watermark,), index_col='id')
+        
+        if not df.empty:
+            watermark = max(watermark, int(df['version'].max()))
+        return self._to_public_columns(df)[list(TRANSACTION_COLUMNS)], watermark
+    
+    def get_transactions_frame(self) -> pd.DataFrame:
+        """
+        Get all transactions as one frame shared by every caller.
+        
+        The frame is cached by data generation. After a write, the next call
+        merges the change feed into a new frame rather than reloading, so
+        frames handed out earlier stay valid snapshots. Callers must treat
+        it as read-only.
+        
+        Returns:
+            pd.DataFrame: All transactions indexed by id, newest first
+        """
+        return self.get_transactions_by_month()[0]
+    
+    def get_transactions_by_month(self) -> Tuple[pd.DataFrame, Dict[int, slice]]:
+        """
+        Get the shared transactions frame together with its month index.
+        
+        The index is rebuilt once per data generation, alongside the frame;
+        selecting a month is then a positional slice of the frame.
+        
+        Returns:
+            Tuple[pd.DataFrame, Dict[int, slice]]: Frame as in
+                get_transactions_frame and its build_month_index
+        """
+        generation = self.data_generation()
+        with self._frame_lock:
+            if self._frame_cache is None:
+                # Watermark first, so writes racing the full load arrive in the next delta
+                watermark = self.get_change_watermark()
+                frame = self.load_transactions()
+            elif self._frame_cache[0] != generation:
+                _, watermark, frame, _ = self._frame_cache
+                changes, watermark = self.get_changes(watermark)
+                frame = merge_transaction_changes(frame, changes)
+            else:
+                return self._frame_cache[2], self._frame_cache[3]
             
-            return df
+            month_index = build_month_index(frame['Fecha valor'])
+            self._frame_cache = (generation, watermark, frame, month_index)
+            return frame, month_index
+    
+    def get_monthly_totals(self, start_month: Optional[str] = None, end_month: Optional[str] = None,
+                           tipo: Optional[str] = None) -> pd.DataFrame:
+        """
+        Read per month, category and type totals from monthly_category_totals.
+        
+        Args:
+            start_month (str, optional): First month included ('YYYY-MM')
+            end_month (str, optional): Last month included ('YYYY-MM')
+            tipo (str, optional): 'Debit' or 'Credit'
+            
+        Returns:
+            pd.DataFrame: 'Month', 'Category', 'Tipo', 'Importe' (euros) and
+                'Count', newest month first
+        """
+        conditions, params = [], []
+        if start_month is not None:
+            conditions.append("month >= ?")
+            params.append(str(start_month))
+        if end_month is not None:
+            conditions.append("month <= ?")
+            params.append(str(end_month))
+        if tipo is not None:
+            conditions.append("tipo = ?")
+            params.append(tipo)
+        
+        with self.connection() as conn:
+            df = pd.read_sql_query(f"""
+                SELECT month AS "Month", category AS "Category", tipo AS "Tipo",
+                       total_cents AS total_cents, transaction_count AS "Count"
+                FROM monthly_category_totals
+                {"WHERE " + " AND ".join(conditions) if conditions else ""}
+                ORDER BY month DESC, category, tipo
+            """, conn, params=params)
+        
+        df.insert(3, 'Importe', df.pop('total_cents') / 100)
+        return df
+    
+    def get_category_totals(self, start_month: Optional[str] = None, end_month: Optional[str] = None,
+                            tipo: Optional[str] = None) -> pd.DataFrame:
+        """
+        Sum monthly_category_totals over a range of months.
+        
+        Args:
+            start_month (str, optional): First month included ('YYYY-MM')
+            end_month (str, optional): Last month included ('YYYY-MM')
+            tipo (str, optional): 'Debit' or 'Credit'
+            
+        Returns:
+            pd.DataFrame: 'Category', 'Tipo', 'Importe' (euros) and 'Count',
+                largest total first
+        """
+        monthly = self.get_monthly_totals(start_month, end_month, tipo)
+        totals = monthly.groupby(['Category', 'Tipo'], as_index=False)[['Importe', 'Count']].sum()
+        return totals.sort_values('Importe', ascending=False, ignore_index=True)
     
-    def update_transaction_category(self, transaction_hash: str, new_category: str):
+    def update_transaction_category(self, dedupe_key: int, new_category: str):
         """
         Update the category of a specific transaction.
         
         Args:
-            transaction_hash (str): Hash of the transaction to update
+            dedupe_key (int): Dedupe key of the transaction to update
             new_category (str): New category name
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        def write(cursor):
             cursor.execute("""
                 UPDATE transactions 
-                SET category = ?, last_modified = CURRENT_TIMESTAMP
-                WHERE transaction_hash = ?
-            """, (new_category, transaction_hash))
-            conn.commit()
+                SET category = ?, last_modified = strftime('%Y-%m-%d %H:%M:%f', 'now'), version = ?
+                WHERE dedupe_key = ?
+            """, (new_category, self._next_version(cursor), dedupe_key))
+        
+        self.writer.submit(write).result()
     
-    def update_transactions_by_concept(self, concepto: str, new_category: str) -> int:
+    def update_transactions_by_merchant(self, merchant_key: str, new_category: str) -> int:
         """
-        Update category for all transactions matching a specific concept.
+        Update category for all transactions of a merchant.
         
         Args:
-            concepto (str): Transaction concept to match
+            merchant_key (str): Normalized merchant key to match
             new_category (str): New category name
             
         Returns:
             int: Number of transactions updated
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        def write(cursor):
             cursor.execute("""
                 UPDATE transactions 
-                SET category = ?, last_modified = CURRENT_TIMESTAMP
-                WHERE concepto = ?
-            """, (new_category, concepto))
+                SET category = ?, last_modified = strftime('%Y-%m-%d %H:%M:%f', 'now'), version = ?
+                WHERE merchant_key = ?
+            """, (new_category, self._next_version(cursor), merchant_key))
             updated_count = cursor.rowcount
-            conn.commit()
             return updated_count
+        
+        return self.writer.submit(write).result()
+    
+    def get_merchants_containing(self, keywords: List[str]) -> Dict[str, str]:
+        """
+        Find stored merchants whose key contains any of the given keywords.
+        
+        Args:
+            keywords (List[str]): Keywords to look for (case-insensitive substring)
+            
+        Returns:
+            Dict[str, str]: Distinct merchant key -> its current category
+        """
+        lowered = sorted({keyword.lower().strip() for keyword in keywords if keyword.strip()})
+        merchants = {}
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            for start in range(0, len(lowered), 500):
+                condition, params = self._concept_filter(lowered[start:start + 500], 'merchant_key')
+                cursor.execute(f"""
+                    SELECT merchant_key, category
+                    FROM transactions
+                    WHERE {condition}
+                    GROUP BY merchant_key
+                """, params)
+                merchants.update(cursor.fetchall())
+        
+        return merchants
+    
+    def search_transaction_ids(self, search_term: str) -> List[int]:
+        """
+        Find transactions whose concept contains a search term.
+        
+        Args:
+            search_term (str): Text to look for (case-insensitive substring)
+            
+        Returns:
+            List[int]: Ids of matching transactions
+        """
+        return self.find_transaction_ids([search_term])
+    
+    def find_transaction_ids(self, keywords: List[str]) -> List[int]:
+        """
+        Find transactions whose concept contains any of the given keywords.
+        
+        Args:
+            keywords (List[str]): Keywords to look for (case-insensitive substring)
+            
+        Returns:
+            List[int]: Ids of matching transactions
+        """
+        terms = sorted({keyword.strip() for keyword in keywords if keyword.strip()})
+        if not terms:
+            return []
+        
+        condition, params = self._concept_filter(terms)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id FROM transactions WHERE {condition}", params)
+            return [row[0] for row in cursor.fetchall()]
+    
+    def update_categories_by_merchant(self, merchant_categories: Dict[str, str]) -> int:
+        """
+        Apply many merchant -> category changes with a single bulk UPDATE.
+        
+        Args:
+            merchant_categories (Dict[str, str]): Merchant key -> new category
+            
+        Returns:
+            int: Number of transactions updated
+        """
+        if not merchant_categories:
+            return 0
+        
+        def write(cursor):
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS category_updates (
+                    merchant_key TEXT PRIMARY KEY,
+                    category TEXT NOT NULL
+                )
+            """)
+            cursor.execute("DELETE FROM category_updates")
+            cursor.executemany(
+                "INSERT OR REPLACE INTO category_updates (merchant_key, category) VALUES (?, ?)",
+                list(merchant_categories.items())
+            )
+            cursor.execute("""
+                UPDATE transactions
+                SET category = (
+                        SELECT u.category FROM category_updates u
+                        WHERE u.merchant_key = transactions.merchant_key
+                    ),
+                    last_modified = strftime('%Y-%m-%d %H:%M:%f', 'now'),
+                    version = ?
+                WHERE merchant_key IN (SELECT merchant_key FROM category_updates)
+            """, (self._next_version(cursor),))
+            updated_count = cursor.rowcount
+            cursor.execute("DELETE FROM category_updates")
+            return updated_count
+        
+        return self.writer.submit(write).result()
     
     def sync_categories(self, categories_dict: Dict[str, List[str]]):
         """
@@ -233,9 +1581,7 @@ class FinanceDatabase:
         Args:
             categories_dict (Dict): Categories dictionary from JSON
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
+        def write(cursor):
             for category_name, keywords in categories_dict.items():
                 keywords_json = json.dumps(keywords)
                 
@@ -243,46 +1589,245 @@ class FinanceDatabase:
                     INSERT OR REPLACE INTO categories (category_name, keywords, last_modified)
                     VALUES (?, ?, CURRENT_TIMESTAMP)
                 """, (category_name, keywords_json))
+        
+        self.writer.submit(write).result()
+    
+    def get_merchant_labels(self, since: int = -1) -> Tuple[Dict[str, str], int]:
+        """
+        Get the current category of every merchant changed past a version.
+        
+        Used to train the local classifier incrementally. Like the change
+        feed, it reads rows through the version index rather than by
+        last_modified, so it neither scans the table nor depends on the clock.
+        When a merchant's rows disagree, the most recently written row wins.
+        
+        Args:
+            since (int): Version watermark; -1 for everything, including rows
+                stored before versions existed
             
-            conn.commit()
+        Returns:
+            Tuple[Dict[str, str], int]: (merchant key -> category, new watermark)
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            # SQLite returns the bare category column from the MAX() row; the
+            # unary + keeps the planner on idx_version instead of walking
+            # idx_merchant_key for the GROUP BY
+            cursor.execute("""
+                SELECT merchant_key, category, MAX(version)
+                FROM transactions
+                WHERE version > ? AND +merchant_key IS NOT NULL
+                GROUP BY +merchant_key
+            """, (since,))
+            rows = cursor.fetchall()
+        
+        labels = {merchant_key: category for merchant_key, category, _ in rows}
+        watermark = max((version for _, _, version in rows), default=since)
+        return labels, watermark
     
-    def get_database_stats(self) -> Dict[str, int]:
+    def get_merchant_categories(self, merchant_keys: List[str], rules_version: str) -> Dict[str, str]:
         """
-        Get statistics about the database.
+        Look up memoized categories for a list of merchants.
         
+        Args:
+            merchant_keys (List[str]): Distinct merchant keys
+            rules_version (str): Fingerprint of the current keyword set
+            
         Returns:
-            Dict: Database statistics
+            Dict[str, str]: Merchant key -> category for merchants already
+                classified under this keyword set
         """
-        with sqlite3.connect(self.db_path) as conn:
+        known = {}
+        
+        with self.connection() as conn:
             cursor = conn.cursor()
             
-            # Total transactions
-            cursor.execute("SELECT COUNT(*) FROM transactions")
-            total_transactions = cursor.fetchone()[0]
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(merchant_keys), 500):
+                chunk = merchant_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"""
+                    SELECT merchant_key, category
+                    FROM merchant_categories
+                    WHERE rules_version = ? AND merchant_key IN ({placeholders})
+                """, (rules_version, *chunk))
+                known.update(cursor.fetchall())
+        
+        return known
+    
+    def save_merchant_categories(self, merchant_categories: Dict[str, str], rules_version: str):
+        """
+        Memoize categories computed for merchants under a keyword set.
+        
+        Entries from older keyword sets are dropped, since they no longer apply.
+        
+        Args:
+            merchant_categories (Dict[str, str]): Merchant key -> category
+            rules_version (str): Fingerprint of the current keyword set
+        """
+        def write(cursor):
+            cursor.execute(
+                "DELETE FROM merchant_categories WHERE rules_version != ?",
+                (rules_version,)
+            )
+            cursor.executemany("""
+                INSERT OR REPLACE INTO merchant_categories (merchant_key, category, rules_version, last_modified)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """, [(merchant_key, category, rules_version) for merchant_key, category in merchant_categories.items()])
+        
+        self.writer.submit(write).result()
+    
+    def rebase_merchant_categories(self, old_version: str, new_version: str, added_keywords: List[str]):
+        """
+        Carry memoized categories over to a keyword set that only added keywords.
+        
+        Merchants containing one of the added keywords may change category, so
+        they are dropped; every other memo entry is still valid and is retagged.
+        Affected merchants are found with a KeywordMatcher of the added
+        keywords, so they fold case exactly as categorization does (SQLite's
+        lower() only folds ASCII letters).
+        
+        Args:
+            old_version (str): Fingerprint of the previous keyword set
+            new_version (str): Fingerprint of the current keyword set
+            added_keywords (List[str]): Keywords added between the two versions
+        """
+        delta_matcher = KeywordMatcher({"added": added_keywords})
+        
+        def write(cursor):
+            cursor.execute(
+                "DELETE FROM merchant_categories WHERE rules_version NOT IN (?, ?)",
+                (old_version, new_version)
+            )
+            
+            cursor.execute(
+                "SELECT merchant_key FROM merchant_categories WHERE rules_version = ?",
+                (old_version,)
+            )
+            merchants = [row[0] for row in cursor.fetchall()]
+            stale = [
+                merchant for merchant, hit in zip(merchants, delta_matcher.match_many(merchants))
+                if hit != delta_matcher.uncategorized
+            ]
+            cursor.executemany(
+                "DELETE FROM merchant_categories WHERE merchant_key = ?",
+                [(merchant,) for merchant in stale]
+            )
             
-            # Transactions by category
-            cursor.execute("""
-                SELECT category, COUNT(*) 
-                FROM transactions 
-                GROUP BY category 
-                ORDER BY COUNT(*) DESC
-            """)
-            category_counts = dict(cursor.fetchall())
+            cursor.execute(
+                "UPDATE merchant_categories SET rules_version = ? WHERE rules_version = ?",
+                (new_version, old_version)
+            )
+        
+        self.writer.submit(write).result()
+    
+    def get_imported_file(self, fingerprint: str) -> Optional[Dict]:
+        """
+        Look up a previously imported file by content hash.
+        
+        Args:
+            fingerprint (str): SHA-256 hex digest of the uploaded bytes
             
-            # Date range
+        Returns:
+            Optional[Dict]: Import record, or None if the file was never imported
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(
+                "SELECT * FROM imported_files WHERE fingerprint = ?",
+                (fingerprint,)
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    def record_imported_file(self, fingerprint: str, file_name: str, row_count: int,
+                             new_count: int, duplicate_count: int):
+        """
+        Remember that an uploaded file has been imported.
+        
+        Args:
+            fingerprint (str): SHA-256 hex digest of the uploaded bytes
+            file_name (str): Original file name
+            row_count (int): Rows parsed from the file
+            new_count (int): Transactions added
+            duplicate_count (int): Transactions skipped as duplicates
+        """
+        def write(cursor):
             cursor.execute("""
-                SELECT MIN(fecha_valor), MAX(fecha_valor) 
-                FROM transactions
+                INSERT OR REPLACE INTO imported_files
+                (fingerprint, file_name, row_count, new_count, duplicate_count, imported_date)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (fingerprint, file_name, row_count, new_count, duplicate_count))
+        
+        self.writer.submit(write).result()
+    
+    def data_generation(self) -> Tuple[int, int]:
+        """
+        Cheap version stamp of the database contents.
+        
+        Returns:
+            Tuple[int, int]: (PRAGMA data_version, writer commit count); it
+                changes whenever this process or any other one commits
+        """
+        return self.pool.data_version(), self.writer.generation
+    
+    def get_database_stats(self) -> Dict[str, int]:
+        """
+        Get statistics about the database.
+        
+        Computed with a single query over monthly_category_totals and the date
+        index, then cached until PRAGMA data_version or the writer's commit
+        count changes, so an idle database costs one pragma read per call.
+        
+        Returns:
+            Dict: Database statistics
+        """
+        version = self.data_generation()
+        with self._stats_lock:
+            if self._stats_cache is not None and self._stats_cache[0] == version:
+                return dict(self._stats_cache[1])
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT category, SUM(transaction_count) AS count,
+                       (SELECT date(MIN(fecha_valor) * 86400, 'unixepoch') FROM transactions),
+                       (SELECT date(MAX(fecha_valor) * 86400, 'unixepoch') FROM transactions)
+                FROM monthly_category_totals
+                GROUP BY category
+                ORDER BY count DESC
             """)
-            date_range = cursor.fetchone()
-            
-            return {
-                'total_transactions': total_transactions,
-                'category_counts': category_counts,
-                'date_range': date_range
-            }
+            rows = cursor.fetchall()
+        
+        category_counts = {category: count for category, count, _, _ in rows}
+        stats = {
+            'total_transactions': sum(category_counts.values()),
+            'category_counts': category_counts,
+            'date_range': (rows[0][2], rows[0][3]) if rows else (None, None)
+        }
+        with self._stats_lock:
+            self._stats_cache = (version, stats)
+        return dict(stats)
+    
+    def get_writer_metrics(self) -> Dict[str, float]:
+        """
+        Get queue and group-commit metrics of the database writer.
+        
+        Returns:
+            Dict[str, float]: See DatabaseWriter.metrics
+        """
+        return self.writer.metrics()
     
     def close(self):
-        """Close database connection (if needed for cleanup)."""
-        # SQLite connections are automatically closed when using context managers
-        pass
+        """
+        Release this instance's hold on the database file.
+        
+        The writer and pooled connections are shared, so they are only stopped
+        and closed when the last instance on the file is closed; writes
+        submitted after that fail instead of waiting for the stopped writer.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        release_database(self.db_path)
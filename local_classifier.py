@@ -0,0 +1,317 @@
+"""
+Local classifier module for Personal Finance Application
+
+Predicts categories for merchant keys offline, before anything is sent to
+OpenAI. Uses a multinomial naive Bayes model over hashed character n-grams,
+implemented with NumPy so training and batch prediction are vectorized.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MODEL_FILE = "finance_model.npz"
+
+# Predictions at or above this probability skip the LLM
+DEFAULT_CONFIDENCE_THRESHOLD = 0.9
+
+# Naive Bayes probabilities are not calibrated: a merchant sharing no n-grams
+# with the training data still gets ~1.0 for some class. Predictions need at
+# least this share of the text's n-grams seen in the predicted class, and a
+# model trained on fewer than MIN_CLASSES categories predicts nothing.
+MIN_NGRAM_OVERLAP = 0.25
+MIN_CLASSES = 2
+
+
+class LocalClassifier:
+    """
+    Naive Bayes over hashed character n-grams of merchant keys.
+
+    The model keeps per-class feature counts, so it can be trained
+    incrementally: new merchants are added, relabeled merchants are moved from
+    their old class to the new one, and merchants relabeled as uncategorized
+    are removed.
+    """
+
+    def __init__(self, n_features: int = 2 ** 16, ngram_sizes: Tuple[int, ...] = (3, 4, 5),
+                 alpha: float = 0.1, uncategorized: str = "Uncategorized"):
+        """
+        Create an empty model.
+
+        Args:
+            n_features (int): Size of the hashed feature space (power of two)
+            ngram_sizes (Tuple[int, ...]): Character n-gram lengths
+            alpha (float): Additive smoothing
+            uncategorized (str): Label that is never learned or predicted
+        """
+        self.n_features = n_features
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.alpha = alpha
+        self.uncategorized = uncategorized
+        self.classes: List[str] = []
+        self.feature_counts = np.zeros((0, n_features), dtype=np.float64)
+        self.class_counts = np.zeros(0, dtype=np.float64)
+        # Merchant -> label it was trained with, needed to undo relabels
+        self.trained: Dict[str, str] = {}
+        # Latest row version already learned from the database
+        self.watermark = -1
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Features
+    # ------------------------------------------------------------------
+
+    def _hash_features(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Hash the character n-grams of all texts in one vectorized pass.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (text index, feature index) per n-gram
+        """
+        padded = [f" {text.lower()} " for text in texts]
+        if not padded:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        lengths = np.fromiter((len(text) for text in padded), dtype=np.int64, count=len(padded))
+        owner = np.repeat(np.arange(len(padded)), lengths)
+        shift = 64 - int(np.log2(self.n_features))
+
+        rows, cols = [], []
+        with np.errstate(over="ignore"):
+            for size in self.ngram_sizes:
+                count = len(codes) - size + 1
+                if count <= 0:
+                    continue
+                # Polynomial hash of each window; uint64 arithmetic wraps around
+                window_hash = np.full(count, size, dtype=np.uint64)
+                for offset in range(size):
+                    window_hash = window_hash * np.uint64(1_000_003) + codes[offset:offset + count]
+                # Drop windows spanning two texts
+                valid = owner[:count] == owner[size - 1:size - 1 + count]
+                mixed = window_hash[valid] * np.uint64(0x9E3779B97F4A7C15)
+                rows.append(owner[:count][valid])
+                cols.append((mixed >> np.uint64(shift)).astype(np.int64))
+
+        return np.concatenate(rows), np.concatenate(cols)
+
+    # ------------------------------------------------------------------
+    # Training
+    # ------------------------------------------------------------------
+
+    def _class_index(self, label: str) -> int:
+        if label not in self.classes:
+            self.classes.append(label)
+            self.feature_counts = np.vstack(
+                [self.feature_counts, np.zeros((1, self.n_features), dtype=np.float64)]
+            )
+            self.class_counts = np.append(self.class_counts, 0.0)
+        return self.classes.index(label)
+
+    def _accumulate(self, texts: List[str], labels: List[str], sign: float):
+        if not texts:
+            return
+        class_ids = np.array([self._class_index(label) for label in labels], dtype=np.int64)
+        rows, cols = self._hash_features(texts)
+        flat = class_ids[rows] * self.n_features + cols
+        counts = np.bincount(flat, minlength=len(self.classes) * self.n_features)
+        self.feature_counts += sign * counts.reshape(len(self.classes), self.n_features)
+        self.class_counts += sign * np.bincount(class_ids, minlength=len(self.classes))
+
+    def update(self, labels: Dict[str, str]) -> int:
+        """
+        Incrementally learn merchant labels.
+
+        Args:
+            labels (Dict[str, str]): Merchant key -> category. Merchants mapped
+                to the uncategorized label are forgotten.
+
+        Returns:
+            int: Number of merchants whose training label changed
+        """
+        with self._lock:
+            removed_texts, removed_labels = [], []
+            added_texts, added_labels = [], []
+            for merchant, label in labels.items():
+                previous = self.trained.get(merchant)
+                if previous == label or (previous is None and label == self.uncategorized):
+                    continue
+                if previous is not None:
+                    removed_texts.append(merchant)
+                    removed_labels.append(previous)
+                    del self.trained[merchant]
+                if label != self.uncategorized:
+                    added_texts.append(merchant)
+                    added_labels.append(label)
+                    self.trained[merchant] = label
+
+            self._accumulate(removed_texts, removed_labels, -1.0)
+            self._accumulate(added_texts, added_labels, 1.0)
+            return len(set(removed_texts) | set(added_texts))
+
+    # ------------------------------------------------------------------
+    # Prediction
+    # ------------------------------------------------------------------
+
+    def predict(self, texts: List[str],
+                min_overlap: float = MIN_NGRAM_OVERLAP) -> Tuple[List[str], np.ndarray]:
+        """
+        Predict categories for a batch of merchant keys.
+
+        Args:
+            texts (List[str]): Merchant keys
+            min_overlap (float): Share of a text's n-grams the predicted class
+                must have seen; texts below it are not predicted
+
+        Returns:
+            Tuple[List[str], np.ndarray]: (predicted category per text, confidence
+                per text in [0, 1]). Texts the model can't judge (fewer than
+                MIN_CLASSES trained categories, or too little n-gram overlap)
+                are uncategorized with confidence 0.
+        """
+        with self._lock:
+            active = self.class_counts > 0
+            if not texts or active.sum() < MIN_CLASSES:
+                return [self.uncategorized] * len(texts), np.zeros(len(texts))
+
+            counts = self.feature_counts[active]
+            class_names = [name for name, keep in zip(self.classes, active) if keep]
+            log_prior = np.log(self.class_counts[active] / self.class_counts[active].sum())
+            smoothed = counts + self.alpha
+            log_likelihood = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+
+            rows, cols = self._hash_features(texts)
+            scores = np.tile(log_prior, (len(texts), 1))
+            for class_id in range(len(class_names)):
+                scores[:, class_id] += np.bincount(
+                    rows, weights=log_likelihood[class_id, cols], minlength=len(texts)
+                )
+
+            # Share of each text's n-grams the best class was trained on
+            best = scores.argmax(axis=1)
+            seen = counts[best[rows], cols] > 0
+            overlap = np.bincount(rows, weights=seen, minlength=len(texts)) / np.maximum(
+                np.bincount(rows, minlength=len(texts)), 1
+            )
+
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        known = overlap >= min_overlap
+        confidence = np.where(known, probabilities[np.arange(len(texts)), best], 0.0)
+        labels = [class_names[i] if ok else self.uncategorized for i, ok in zip(best, known)]
+        return labels, confidence
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str):
+        """
+        Persist the model to an .npz file.
+
+        Args:
+            path (str): Destination file
+        """
+        with self._lock:
+            merchants = list(self.trained.keys())
+            tmp_path = f"{path}.tmp.npz"
+            np.savez_compressed(
+                tmp_path,
+                n_features=self.n_features,
+                ngram_sizes=np.array(self.ngram_sizes),
+                alpha=self.alpha,
+                classes=np.array(self.classes, dtype=str),
+                feature_counts=self.feature_counts.astype(np.float32),
+                class_counts=self.class_counts,
+                merchants=np.array(merchants, dtype=str),
+                merchant_labels=np.array([self.trained[m] for m in merchants], dtype=str),
+                watermark=np.array(self.watermark),
+            )
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, uncategorized: str = "Uncategorized") -> "LocalClassifier":
+        """
+        Load a model saved with save().
+
+        Args:
+            path (str): Model file
+            uncategorized (str): Label that is never learned or predicted
+
+        Returns:
+            LocalClassifier: Restored model
+        """
+        with np.load(path, allow_pickle=False) as data:
+            model = cls(
+                n_features=int(data["n_features"]),
+                ngram_sizes=tuple(int(n) for n in data["ngram_sizes"]),
+                alpha=float(data["alpha"]),
+                uncategorized=uncategorized,
+            )
+            model.classes = [str(name) for name in data["classes"]]
+            model.feature_counts = data["feature_counts"].astype(np.float64)
+            model.class_counts = data["class_counts"].astype(np.float64)
+            model.trained = dict(zip((str(m) for m in data["merchants"]),
+                                     (str(l) for l in data["merchant_labels"])))
+            try:
+                model.watermark = int(data["watermark"])
+            except ValueError:
+                # Older models kept a last_modified timestamp; relearn every label
+                model.watermark = -1
+        return model
+
+
+def model_path_for(db_path: str) -> str:
+    """
+    Path of the model file stored next to a database file.
+
+    Args:
+        db_path (str): Path to the SQLite database
+
+    Returns:
+        str: Path to the model file
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), MODEL_FILE)
+
+
+def load_or_create(path: str, uncategorized: str = "Uncategorized") -> LocalClassifier:
+    """
+    Load the persisted model, or start an empty one if none can be read.
+
+    Args:
+        path (str): Model file
+        uncategorized (str): Label that is never learned or predicted
+
+    Returns:
+        LocalClassifier: Model ready for incremental training
+    """
+    if os.path.exists(path):
+        try:
+            return LocalClassifier.load(path, uncategorized)
+        except Exception as e:
+            print(f"⚠️ Could not load local classifier, retraining from scratch: {e}")
+    return LocalClassifier(uncategorized=uncategorized)
+
+
+def refresh_from_database(model: LocalClassifier, db, path: Optional[str] = None) -> int:
+    """
+    Learn labels changed in the database since the model's watermark.
+
+    Args:
+        model (LocalClassifier): Model to update in place
+        db (FinanceDatabase): Source of categorized merchants
+        path (str, optional): Save the model here if it changed
+
+    Returns:
+        int: Number of merchants whose training label changed
+    """
+    labels, watermark = db.get_merchant_labels(since=model.watermark)
+    changed = model.update(labels)
+    if watermark != model.watermark:
+        model.watermark = watermark
+        if path:
+            model.save(path)
+    return changed
@@ -11,6 +11,7 @@ import numpy as np
 import plotly.express as px
 import json
 import os
+import hashlib
 import importlib
 import sys
 
@@ -19,7 +20,18 @@ if 'open_ai_service' in sys.modules:
     importlib.reload(sys.modules['open_ai_service'])
 
 from open_ai_service import OpenAIService
-from database import FinanceDatabase
+from database import (
+    FinanceDatabase, IMPORT_STATUS_NEW, IMPORT_STATUS_DUPLICATE, IMPORT_STATUS_INVALID
+)
+from merchants import normalize_merchants, normalize_merchant
+from amounts import parse_amounts, detect_decimal_separator
+from local_classifier import (
+    DEFAULT_CONFIDENCE_THRESHOLD, load_or_create, model_path_for, refresh_from_database
+)
+from categorizer import (
+    UNCATEGORIZED_CATEGORY, KeywordMatcher, get_matcher, categories_version,
+    factorize_concepts, broadcast_categories, new_keywords_between, match_concepts
+)
 
 # Configuration
 st.set_page_config(
@@ -31,7 +43,14 @@ st.set_page_config(
 
 # Constants
 CATEGORIES_FILE = "categories.json"
-UNCATEGORIZED_CATEGORY = "Uncategorized"
+
+# Uploads this large are imported in chunks of STREAMING_CHUNK_ROWS rows
+STREAMING_MIN_BYTES = 20 * 2 ** 20
+STREAMING_CHUNK_ROWS = 50_000
+
+# The transaction editor loads one page of this many rows at a time
+EDITOR_PAGE_SIZES = [25, 50, 100, 250]
+EDITOR_SORT_COLUMNS = ['Fecha valor', 'Importe', 'Concepto', 'Category']
 
 # Custom CSS for modern financial app styling
 def load_custom_css():
@@ -71,95 +90,265 @@ def save_categories():
     with open(CATEGORIES_FILE, "w") as f:
         json.dump(st.session_state.categories, f, indent=2, ensure_ascii=False)
 
-def load_transactions(file):
+def fingerprint_upload(file):
     """
-    Load and process bank statement CSV file.
+    Compute a content hash of an uploaded file.
     
     Args:
         file: Uploaded CSV file from Streamlit file_uploader
         
     Returns:
-        pandas.DataFrame: Processed DataFrame with cleaned data and categories, or None if error
+        str: SHA-256 hex digest of the file bytes
     """
-    try:
-        # Load and clean CSV data
-        df = pd.read_csv(file)
-        df.columns = [col.strip() for col in df.columns]
+    return hashlib.sha256(file.getvalue()).hexdigest()
+
+def clean_transactions(df, decimal=None):
+    """
+    Clean a raw bank statement frame read from CSV.
+    
+    Args:
+        df (pandas.DataFrame): Rows as read by pd.read_csv, a whole file or one chunk
+        decimal (str, optional): Decimal separator of 'Importe', detected from df when not given
         
-        # Drop Saldo column if it exists
-        if 'Saldo' in df.columns:
-            df = df.drop('Saldo', axis=1)
+    Returns:
+        pandas.DataFrame: DataFrame with 'Fecha valor', 'Concepto', 'Importe' and 'Tipo'.
+            Rows whose amount can't be read keep a missing 'Importe'.
+    """
+    df.columns = [col.strip() for col in df.columns]
+    
+    # Drop Saldo column if it exists
+    if 'Saldo' in df.columns:
+        df = df.drop('Saldo', axis=1)
+    
+    # Parse monetary amounts into positive cents and a sign in one pass
+    cents, signs = parse_amounts(df['Importe'], decimal)
+    
+    # Unreadable amounts become missing, so the import reports them as invalid rows
+    bad_rows = df.index[signs == 0]
+    if len(bad_rows):
+        print(f"❌ Unreadable amounts in rows: {', '.join(str(i) for i in bad_rows[:20])}"
+              + (" ..." if len(bad_rows) > 20 else ""))
+    df['Importe'] = np.where(signs != 0, cents / 100, np.nan)
+    
+    # Create transaction type column (Debit/Credit)
+    df['Tipo'] = np.where(signs < 0, 'Debit', 'Credit')
+    
+    # Parse dates
+    df['Fecha valor'] = pd.to_datetime(df['Fecha valor'], format='%d/%m/%Y')
+    
+    return df
+
+def parse_transactions_csv(file):
+    """
+    Parse and clean a bank statement CSV file.
+    
+    Args:
+        file: Uploaded CSV file from Streamlit file_uploader
         
+    Returns:
+        pandas.DataFrame: DataFrame with 'Fecha valor', 'Concepto', 'Importe' and 'Tipo'
+    """
+    # Read as text so parse_amounts sees the amounts as written: pandas would
+    # read '2.500' (two thousand five hundred euros) as 2.5
+    file.seek(0)
+    return clean_transactions(pd.read_csv(file, dtype=str))
+
+def stream_transactions_file(file, insert=True, chunksize=STREAMING_CHUNK_ROWS):
+    """
+    Parse, categorize and store a large CSV file one chunk at a time.
+    
+    Each chunk of chunksize rows is cleaned, categorized and bulk-inserted
+    before the next one is read, so memory use does not grow with the file.
+    Chunks keep the running row index of the file, and rows repeating a row of
+    an earlier chunk find it already stored, so the report and counts match a
+    single-frame import of the same file. The decimal separator of 'Importe' is
+    detected on the first chunk and reused for the rest, so a later chunk of
+    only whole or thousands-grouped amounts keeps the file's convention.
+    
+    Args:
+        file: Uploaded CSV file from Streamlit file_uploader
+        insert (bool): Insert the rows, False for files imported before
+        chunksize (int): Rows per chunk
         
-        # Clean and convert monetary amounts
-        df['Importe'] = df['Importe'].str.replace('.', '').str.replace(',', '.').str.replace('€', '').astype(float)
+    Returns:
+        tuple: (rows needing attention: uncategorized, duplicate or invalid;
+            per-row import report or None; total rows read)
+    """
+    # Line count is only used for the progress estimate
+    estimated_rows = max(file.getvalue().count(b"\n") - 1, 1)
+    progress = st.progress(0.0, text="📥 Importing transactions...")
+    
+    kept, reports = [], []
+    rows_read = 0
+    decimal = None
+    file.seek(0)
+    # Amounts are read as text, as in parse_transactions_csv
+    for chunk in pd.read_csv(file, chunksize=chunksize, dtype=str):
+        chunk.columns = [col.strip() for col in chunk.columns]
+        if decimal is None:
+            decimal = detect_decimal_separator(chunk['Importe'])
+        chunk = categorize_transactions(clean_transactions(chunk, decimal))
+        keep = chunk['Category'] == UNCATEGORIZED_CATEGORY
+        if insert:
+            report = st.session_state.db.import_transactions(chunk)
+            reports.append(report)
+            keep |= report['Status'] != IMPORT_STATUS_NEW
+        kept.append(chunk[keep])
         
-        # Create transaction type column (Debit/Credit)
-        df['Tipo'] = df['Importe'].apply(lambda x: 'Debit' if x < 0 else 'Credit')
+        rows_read += len(chunk)
+        progress.progress(min(rows_read / estimated_rows, 1.0),
+                          text=f"📥 Imported {rows_read:,} of ~{estimated_rows:,} rows")
+    progress.empty()
+    
+    df = pd.concat(kept) if kept else pd.DataFrame()
+    report = pd.concat(reports) if reports else None
+    return df, report, rows_read
+
+def import_transactions_file(file, fingerprint):
+    """
+    Parse, categorize and store an uploaded file that has not been processed yet.
+    
+    Files already imported in an earlier session are parsed and categorized
+    again (to offer AI categorization) but not re-inserted. Files of
+    STREAMING_MIN_BYTES or more are imported chunk by chunk; their result
+    only keeps the rows that need attention instead of the whole file.
+    
+    Args:
+        file: Uploaded CSV file from Streamlit file_uploader
+        fingerprint (str): Content hash of the file
         
-        # Convert all amounts to positive values
-        df['Importe'] = df['Importe'].abs()
+    Returns:
+        dict: Import result with 'df', 'new_count', 'duplicate_count', 'invalid_count',
+            'report' (per-row import status, None when nothing was inserted) and 'imported_date'
+    """
+    previous_import = st.session_state.db.get_imported_file(fingerprint)
+    
+    if file.size >= STREAMING_MIN_BYTES:
+        df, report, row_count = stream_transactions_file(file, insert=not previous_import)
+    else:
+        df = parse_transactions_csv(file)
         
-        # Parse dates
-        df['Fecha valor'] = pd.to_datetime(df['Fecha valor'], format='%d/%m/%Y')
-
         # Initial categorization
         df = categorize_transactions(df)
+        row_count = len(df)
         
-        # Save new transactions to database and get statistics
-        new_count, duplicate_count = st.session_state.db.insert_transactions(df)
-        
-        # Update the all_transactions_df with latest data from database
-        st.session_state.all_transactions_df = st.session_state.db.load_all_transactions()
+        # Save new transactions to database and get a per-row report
+        report = None if previous_import else st.session_state.db.import_transactions(df)
+    
+    if previous_import:
+        print(f"⏭️ File {file.name} already imported on {previous_import['imported_date']}, skipping insert")
+        return {
+            'df': df,
+            'new_count': 0,
+            'duplicate_count': row_count,
+            'invalid_count': 0,
+            'report': None,
+            'imported_date': previous_import['imported_date']
+        }
+    
+    status_counts = report['Status'].value_counts()
+    new_count = int(status_counts.get(IMPORT_STATUS_NEW, 0))
+    duplicate_count = int(status_counts.get(IMPORT_STATUS_DUPLICATE, 0))
+    invalid_count = int(status_counts.get(IMPORT_STATUS_INVALID, 0))
+    st.session_state.db.record_imported_file(fingerprint, file.name, row_count, new_count,
+                                             duplicate_count + invalid_count)
+    
+    # Sync categories to database
+    st.session_state.db.sync_categories(st.session_state.categories)
+    
+    # Console logging for initial uncategorized transactions
+    uncategorized_df = df[df['Category'] == UNCATEGORIZED_CATEGORY]
+    if len(uncategorized_df) > 0:
+        print(f"\n⚠️  FOUND {len(uncategorized_df)} UNCATEGORIZED TRANSACTIONS:")
+        print("=" * 80)
+        for i, (_, row) in enumerate(uncategorized_df.iterrows(), 1):
+            concept_display = row['Concepto'][:70] + "..." if len(row['Concepto']) > 70 else row['Concepto']
+            date_str = row['Fecha valor'].strftime('%d/%m/%Y') if 'Fecha valor' in row else 'N/A'
+            amount_str = f"{row['Importe']:.2f}€" if 'Importe' in row else 'N/A'
+            print(f"{i:2d}. [{date_str}] {amount_str} - {concept_display}")
+        print("=" * 80)
+    
+    return {
+        'df': df,
+        'new_count': new_count,
+        'duplicate_count': duplicate_count,
+        'invalid_count': invalid_count,
+        'report': report,
+        'imported_date': None
+    }
+
+def load_transactions(file):
+    """
+    Load and process bank statement CSV file.
+    
+    The upload is fingerprinted by content. A file already processed in this
+    session is not parsed, categorized or inserted again on reruns; its cached
+    result is shown instead.
+    
+    Args:
+        file: Uploaded CSV file from Streamlit file_uploader
         
-        # Always display database operation results
-        col1, col2 = st.columns(2)
-        with col1:
-            if new_count > 0:
-                st.success(f"✅ Added {new_count} new transactions to database")
-            else:
-                st.info(f"📊 No new transactions added")
-        with col2:
-            if duplicate_count > 0:
-                st.warning(f"⏭️ Skipped {duplicate_count} duplicate transactions")
-            else:
-                st.info(f"🆕 All transactions were new")
+    Returns:
+        pandas.DataFrame: Processed DataFrame with cleaned data and categories, or None if error
+    """
+    try:
+        fingerprint = fingerprint_upload(file)
+        processed_uploads = st.session_state.setdefault("processed_uploads", {})
         
-        # Summary message
-        total_processed = new_count + duplicate_count
-        if duplicate_count == total_processed and duplicate_count > 0:
-            st.info(f"🔄 File already processed - all {duplicate_count} transactions were duplicates")
-        elif new_count > 0:
-            st.success(f"🎉 Successfully processed {total_processed} transactions ({new_count} new, {duplicate_count} duplicates)")
+        if fingerprint not in processed_uploads:
+            processed_uploads[fingerprint] = import_transactions_file(file, fingerprint)
+        result = processed_uploads[fingerprint]
+        df = result['df']
+        new_count = result['new_count']
+        duplicate_count = result['duplicate_count']
         
-        # Sync categories to database
-        st.session_state.db.sync_categories(st.session_state.categories)
+        # Always display database operation results
+        if result['imported_date']:
+            st.info(f"🔄 File already imported on {result['imported_date']} - nothing new to add")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                if new_count > 0:
+                    st.success(f"✅ Added {new_count} new transactions to database")
+                else:
+                    st.info(f"📊 No new transactions added")
+            with col2:
+                if duplicate_count > 0:
+                    st.warning(f"⏭️ Skipped {duplicate_count} duplicate transactions")
+                else:
+                    st.info(f"🆕 All transactions were new")
+            
+            # Summary message
+            total_processed = new_count + duplicate_count
+            if duplicate_count == total_processed and duplicate_count > 0:
+                st.info(f"🔄 File already processed - all {duplicate_count} transactions were duplicates")
+            elif new_count > 0:
+                st.success(f"🎉 Successfully processed {total_processed} transactions ({new_count} new, {duplicate_count} duplicates)")
+            
+            if result['invalid_count'] > 0:
+                st.error(f"❌ Skipped {result['invalid_count']} invalid rows with a missing date or concept, or an unreadable amount - see the import report")
+            
+            render_import_report(df, result['report'])
         
         # Check for uncategorized transactions and offer AI categorization
-        uncategorized_df = df[df['Category'] == UNCATEGORIZED_CATEGORY]
-        uncategorized_count = len(uncategorized_df)
+        uncategorized_count = int((df['Category'] == UNCATEGORIZED_CATEGORY).sum())
         
         if uncategorized_count > 0:
             st.warning(f"⚠️ Found {uncategorized_count} uncategorized transactions.")
             
-            # Console logging for initial uncategorized transactions
-            print(f"\n⚠️  FOUND {uncategorized_count} UNCATEGORIZED TRANSACTIONS:")
-            print("=" * 80)
-            for i, (_, row) in enumerate(uncategorized_df.iterrows(), 1):
-                concept_display = row['Concepto'][:70] + "..." if len(row['Concepto']) > 70 else row['Concepto']
-                date_str = row['Fecha valor'].strftime('%d/%m/%Y') if 'Fecha valor' in row else 'N/A'
-                amount_str = f"{row['Importe']:.2f}€" if 'Importe' in row else 'N/A'
-                print(f"{i:2d}. [{date_str}] {amount_str} - {concept_display}")
-            print("=" * 80)
-            
             # Add AI categorization button
             col1, col2 = st.columns([1, 3])
             with col1:
                 if st.button("🤖 AI Categorize", help="Let AI analyze and categorize uncategorized transactions"):
+                    previous_categories = df['Category'].astype(object)
                     df = ai_categorize_uncategorized_transactions(df)
-                    # Update database with AI categorized transactions
-                    st.session_state.db.insert_transactions(df)
-                    st.session_state.all_transactions_df = st.session_state.db.load_all_transactions()
+                    result['df'] = df
+                    # The rows are stored already; persist the categories of the
+                    # merchants that just got one
+                    changed = df['Category'].astype(object) != previous_categories
+                    st.session_state.db.update_categories_by_merchant(
+                        dict(zip(merchant_keys_for(df)[changed], df.loc[changed, 'Category']))
+                    )
                     st.rerun()  # Refresh to show updated data
             with col2:
                 st.info("💡 Click 'AI Categorize' to let AI help categorize your transactions automatically!")
@@ -169,34 +358,208 @@ def load_transactions(file):
         st.error(f"Error loading transactions: {e}")
         return None
 
+def render_import_report(df, report):
+    """
+    Show which rows of an upload were new, duplicate or invalid.
+    
+    Args:
+        df (pandas.DataFrame): Parsed upload
+        report (pandas.DataFrame): Per-row report from FinanceDatabase.import_transactions
+    """
+    if report is None or report.empty:
+        return
+    
+    with st.expander("📋 Import report", expanded=False):
+        status_filter = st.multiselect(
+            "Show rows",
+            [IMPORT_STATUS_NEW, IMPORT_STATUS_DUPLICATE, IMPORT_STATUS_INVALID],
+            default=[IMPORT_STATUS_DUPLICATE, IMPORT_STATUS_INVALID],
+            key="import_report_filter"
+        )
+        rows = report[report['Status'].isin(status_filter)]
+        # Streamed imports keep no details for new, categorized rows
+        details = df[['Fecha valor', 'Concepto', 'Importe']].reindex(rows.index).join(rows)
+        st.caption(f"{len(rows)} of {len(report)} rows")
+        st.dataframe(
+            details,
+            column_config={
+                "Fecha valor": st.column_config.DateColumn("Date", format="DD/MM/YYYY"),
+                "Importe": st.column_config.NumberColumn("Amount", format="%.2f €")
+            },
+            use_container_width=True
+        )
+
+def merchant_keys_for(df):
+    """
+    Get merchant keys for a transaction DataFrame.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame with transaction data
+        
+    Returns:
+        pandas.Series: The 'Merchant' column if present, otherwise keys derived from 'Concepto'
+    """
+    if 'Merchant' in df.columns:
+        return df['Merchant']
+    return normalize_merchants(df['Concepto'])
+
 def categorize_transactions(df):
     """
     Automatically categorize transactions based on keywords in transaction descriptions.
     
+    Descriptions are first normalized to merchant keys (stored in a 'Merchant'
+    column), then each distinct merchant is classified once and the result is
+    mapped back to every row. Merchants already classified under the current
+    keyword set are read from the database memo instead of being matched
+    again. When several keywords match, the longest keyword wins and ties go
+    to the category listed first in categories.json.
+    
     Args:
         df (pandas.DataFrame): DataFrame with transaction data
         
     Returns:
-        pandas.DataFrame: DataFrame with added 'Category' column
+        pandas.DataFrame: DataFrame with added 'Merchant' and 'Category' columns
+    """
+    matcher = get_matcher(st.session_state.categories)
+    rules_version = categories_version(st.session_state.categories)
+    
+    df['Merchant'] = normalize_merchants(df['Concepto'])
+    codes, unique_merchants = factorize_concepts(df['Merchant'])
+    merchant_categories = st.session_state.db.get_merchant_categories(unique_merchants, rules_version)
+    
+    # Only match merchants that have not been seen under this keyword set;
+    # large back-loads are spread over a process pool
+    unknown_merchants = [merchant for merchant in unique_merchants if merchant not in merchant_categories]
+    if unknown_merchants:
+        matched = dict(zip(unknown_merchants, match_concepts(matcher, unknown_merchants)))
+        st.session_state.db.save_merchant_categories(matched, rules_version)
+        merchant_categories.update(matched)
+    
+    df['Category'] = broadcast_categories(
+        codes,
+        [merchant_categories[merchant] for merchant in unique_merchants],
+        df.index
+    )
+    return df
+
+def apply_new_keywords(previous_categories, df=None):
+    """
+    Incrementally re-categorize transactions after keywords were added.
+    
+    Only merchants containing one of the newly added keywords can change
+    category, so only those are matched again: rows in the given DataFrame and
+    rows already stored in the database. Database changes are written with a
+    single bulk UPDATE.
+    
+    Args:
+        previous_categories (dict): Categories before keywords were added
+        df (pandas.DataFrame, optional): In-memory transactions to patch as well
+        
+    Returns:
+        tuple: (DataFrame with updated 'Category' column or None, number of database rows updated)
+    """
+    new_keywords = new_keywords_between(previous_categories, st.session_state.categories)
+    if not new_keywords:
+        return df, 0
+    
+    matcher = get_matcher(st.session_state.categories)
+    delta_matcher = KeywordMatcher(new_keywords)
+    added_keywords = [keyword for keywords in new_keywords.values() for keyword in keywords]
+    
+    # Patch the in-memory frame: only merchants hit by a new keyword are re-matched
+    if df is not None and not df.empty:
+        codes, unique_merchants = factorize_concepts(merchant_keys_for(df))
+        hits = delta_matcher.match_many(unique_merchants)
+        touched = np.array([hit != UNCATEGORIZED_CATEGORY for hit in hits] + [False])
+        if touched.any():
+            unique_categories = [
+                matcher.match(merchant) if hit != UNCATEGORIZED_CATEGORY else None
+                for merchant, hit in zip(unique_merchants, hits)
+            ]
+            row_mask = touched.take(codes)
+            new_categories = broadcast_categories(codes, unique_categories, df.index)
+            df.loc[row_mask, 'Category'] = new_categories[row_mask]
+    
+    # Patch stored transactions whose merchant contains a new keyword
+    candidates = st.session_state.db.get_merchants_containing(added_keywords)
+    changes = {}
+    for merchant, current_category in candidates.items():
+        new_category = matcher.match(merchant)
+        if new_category != current_category:
+            changes[merchant] = new_category
+    updated_count = st.session_state.db.update_categories_by_merchant(changes)
+    
+    # Memoized results stay valid except for merchants the new keywords touch
+    st.session_state.db.rebase_merchant_categories(
+        categories_version(previous_categories),
+        categories_version(st.session_state.categories),
+        added_keywords
+    )
+    
+    print(f"🔁 Incremental re-categorization: {len(added_keywords)} new keywords, "
+          f"{len(candidates)} candidate merchants, {updated_count} stored rows updated")
+    return df, updated_count
+
+@st.cache_resource
+def load_local_classifier(model_path):
+    """
+    Load the persisted local classifier once per process.
+    
+    Args:
+        model_path (str): Model file next to the database
+        
+    Returns:
+        LocalClassifier: Shared classifier instance
+    """
+    return load_or_create(model_path, UNCATEGORIZED_CATEGORY)
+
+def local_categorize_transactions(df):
     """
-    df['Category'] = UNCATEGORIZED_CATEGORY
+    Categorize uncategorized transactions with the offline classifier.
     
-    for category, keywords in st.session_state.categories.items():
-        if category == UNCATEGORIZED_CATEGORY or not keywords:
-            continue
+    The classifier is first brought up to date with merchants categorized in
+    the database since it was last trained. Only predictions at or above the
+    confidence threshold are applied; the rest, and merchants unlike anything
+    the classifier was trained on, stay uncategorized for the LLM.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame with transactions and categories
         
-        lowered_keywords = [keyword.lower().strip() for keyword in keywords]
-        for idx, row in df.iterrows():
-            details = row['Concepto'].lower().strip()
-            if any(keyword in details for keyword in lowered_keywords):
-                df.at[idx, 'Category'] = category
-                
+    Returns:
+        pandas.DataFrame: DataFrame with locally predicted categories applied
+    """
+    model_path = model_path_for(st.session_state.db.db_path)
+    classifier = load_local_classifier(model_path)
+    refresh_from_database(classifier, st.session_state.db, model_path)
+    
+    merchants = merchant_keys_for(df)
+    uncategorized_mask = df['Category'] == UNCATEGORIZED_CATEGORY
+    unique_merchants = merchants[uncategorized_mask].unique().tolist()
+    predicted, confidence = classifier.predict(unique_merchants)
+    
+    confident = {
+        merchant: category
+        for merchant, category, score in zip(unique_merchants, predicted, confidence)
+        if score >= DEFAULT_CONFIDENCE_THRESHOLD and category != UNCATEGORIZED_CATEGORY
+    }
+    print(f"🧠 Local classifier: {len(confident)} of {len(unique_merchants)} merchants above "
+          f"{DEFAULT_CONFIDENCE_THRESHOLD:.0%} confidence")
+    if not confident:
+        return df
+    
+    row_mask = uncategorized_mask & merchants.isin(list(confident))
+    df.loc[row_mask, 'Category'] = merchants[row_mask].map(confident)
+    st.session_state.db.update_categories_by_merchant(confident)
+    st.info(f"🧠 Local model categorized {int(row_mask.sum())} transactions from {len(confident)} merchants")
     return df
 
 def ai_categorize_uncategorized_transactions(df):
     """
     Use AI to categorize transactions that remain uncategorized after initial categorization.
     
+    The local classifier runs first; only merchants it is not confident about
+    are sent to OpenAI.
+    
     Args:
         df (pandas.DataFrame): DataFrame with transactions and categories
         
@@ -210,8 +573,16 @@ def ai_categorize_uncategorized_transactions(df):
         st.success("🎉 All transactions are already categorized!")
         return df
     
-    # Get unique uncategorized transaction descriptions (limit to avoid API costs)
-    uncategorized_descriptions = uncategorized_df['Concepto'].unique()[:20]  # Limit to 20 unique descriptions
+    # Try the local classifier first; only low-confidence merchants reach the LLM
+    df = local_categorize_transactions(df)
+    uncategorized_df = df[df['Category'] == UNCATEGORIZED_CATEGORY]
+    
+    if len(uncategorized_df) == 0:
+        st.success("🎉 All transactions are now categorized!")
+        return df
+    
+    # Get unique uncategorized merchants (limit to avoid API costs)
+    uncategorized_descriptions = merchant_keys_for(uncategorized_df).unique()[:20]  # Limit to 20 unique merchants
     
     if len(uncategorized_descriptions) == 0:
         return df
@@ -288,7 +659,7 @@ def ai_categorize_uncategorized_transactions(df):
             
             if new_keyword_count > original_keyword_count:
                 # Store original categories for comparison
-                original_categories = st.session_state.categories.copy()
+                original_categories = {cat: list(keywords) for cat, keywords in st.session_state.categories.items()}
                 
                 # Get original uncategorized transactions to track what gets categorized
                 original_uncategorized_df = df[df['Category'] == UNCATEGORIZED_CATEGORY].copy()
@@ -302,8 +673,8 @@ def ai_categorize_uncategorized_transactions(df):
                 # Save updated categories to file
                 save_categories()
                 
-                # Re-categorize all transactions with updated categories
-                df = categorize_transactions(df)
+                # Re-categorize only the transactions the new keywords can affect
+                df, _ = apply_new_keywords(original_categories, df)
                 
                 # Count uncategorized transactions after update
                 uncategorized_after = len(df[df['Category'] == UNCATEGORIZED_CATEGORY])
@@ -439,15 +810,19 @@ def add_keywords_to_category(category, keywords):
     """
     keyword = keywords.strip()
     if keywords and keywords not in st.session_state.categories[category]:
+        previous_categories = {cat: list(kws) for cat, kws in st.session_state.categories.items()}
         st.session_state.categories[category].append(keyword)
         save_categories()
+        
+        # Apply the new keyword to stored transactions it affects
+        apply_new_keywords(previous_categories)
         st.success(f"Keyword {keyword} added to category {category}")
         return True
     else:
         st.error(f"Keyword {keyword} already exists in category {category}")
         return False
 
-def format_bank_statement_for_ai(debits_df, credits_df, selected_month):
+def format_bank_statement_for_ai(debits_df, credits_df, selected_month, summary):
     """
     Format bank statement data into a structured format for OpenAI analysis.
     
@@ -455,24 +830,14 @@ def format_bank_statement_for_ai(debits_df, credits_df, selected_month):
         debits_df (pandas.DataFrame): Debit transactions
         credits_df (pandas.DataFrame): Credit transactions  
         selected_month (str): Selected month filter
+        summary (dict): Totals from summarize_totals
         
     Returns:
         str: Formatted bank statement data as JSON string
     """
-    # Calculate summary statistics (excluding savings from expenses)
-    total_income = credits_df['Importe'].sum()
-    
-    # Separate savings from expenses
-    savings_df = debits_df[debits_df['Category'] == 'Savings']
-    expenses_df = debits_df[debits_df['Category'] != 'Savings']
-    
-    total_savings = savings_df['Importe'].sum()
-    total_expenses = expenses_df['Importe'].sum()
-    balance = total_income - (total_expenses + total_savings)
-    
-    # Get category breakdown (excluding savings from expenses)
-    category_breakdown = expenses_df.groupby('Category')['Importe'].sum().to_dict()
-    savings_breakdown = {'Savings': float(total_savings)} if total_savings > 0 else {}
+    # Summary statistics come pre-aggregated (savings excluded from expenses)
+    total_savings = summary['total_savings']
+    savings_breakdown = {'Savings': total_savings} if total_savings > 0 else {}
     
     # Format transaction data
     debit_transactions = []
@@ -496,18 +861,18 @@ def format_bank_statement_for_ai(debits_df, credits_df, selected_month):
     bank_statement_data = {
         "period": selected_month if selected_month != 'All Months' else 'All available data',
         "summary": {
-            "total_income": float(total_income),
-            "total_expenses": float(total_expenses),
-            "total_savings": float(total_savings),
-            "net_balance": float(balance),
+            "total_income": summary['total_income'],
+            "total_expenses": summary['total_expenses'],
+            "total_savings": total_savings,
+            "net_balance": summary['balance'],
             "transaction_count": {
-                "debits": len(debits_df),
-                "credits": len(credits_df),
-                "expenses": len(expenses_df),
-                "savings": len(savings_df)
+                "debits": summary['debit_count'],
+                "credits": summary['credit_count'],
+                "expenses": summary['expense_count'],
+                "savings": summary['savings_count']
             }
         },
-        "expense_categories": category_breakdown,
+        "expense_categories": summary['expense_categories'],
         "savings_categories": savings_breakdown,
         "recent_debits": debit_transactions,
         "recent_credits": credit_transactions
@@ -519,49 +884,102 @@ def format_bank_statement_for_ai(debits_df, credits_df, selected_month):
 # DATA FILTERING FUNCTIONS
 # ============================================================================
 
-def prepare_monthly_data(df):
+def load_month_transactions(transactions_df, month_index, selected_month):
     """
-    Prepare data for monthly filtering by extracting month-year periods.
+    Select the transactions of a month from the shared frame.
     
     Args:
-        df (pandas.DataFrame): Transaction DataFrame
+        transactions_df (pandas.DataFrame): Shared frame, newest first
+        month_index (dict): Month code -> row slice, from get_transactions_by_month
+        selected_month (str): Selected month string ('YYYY-MM') or 'All Months'
         
     Returns:
-        tuple: (DataFrame with Month_Year column, sorted list of available months)
+        pandas.DataFrame: Transactions of that month, newest first
     """
-    df['Month_Year'] = df['Fecha valor'].dt.to_period('M')
-    available_months = sorted(df['Month_Year'].unique(), reverse=True)
-    return df, available_months
+    if selected_month == 'All Months':
+        return transactions_df
+    
+    month_code = pd.Period(selected_month, freq='M').ordinal
+    return transactions_df.iloc[month_index.get(month_code, slice(0, 0))]
 
-def filter_data_by_month(df, selected_month):
+def load_month_totals(selected_month):
     """
-    Filter DataFrame by selected month or return all data.
+    Load pre-aggregated category totals of the selected month.
     
     Args:
-        df (pandas.DataFrame): Full transaction DataFrame
-        selected_month (str): Selected month string or 'All Months'
+        selected_month (str): Selected month string ('YYYY-MM') or 'All Months'
         
     Returns:
-        pandas.DataFrame: Filtered DataFrame
+        pandas.DataFrame: 'Category', 'Tipo', 'Importe' and 'Count' per category and type
     """
     if selected_month == 'All Months':
-        return df.copy()
-    else:
-        return df[df['Month_Year'] == selected_month].copy()
+        return st.session_state.db.get_category_totals()
+    return st.session_state.db.get_category_totals(selected_month, selected_month)
+
+def summarize_totals(category_totals):
+    """
+    Derive income, expense and savings figures from category totals.
+    
+    Args:
+        category_totals (pandas.DataFrame): Output of load_month_totals
+        
+    Returns:
+        dict: total_income, total_expenses, total_savings, balance, the matching
+            transaction counts and the expense total per category
+    """
+    credits = category_totals[category_totals['Tipo'] == 'Credit']
+    debits = category_totals[category_totals['Tipo'] == 'Debit']
+    savings = debits[debits['Category'] == 'Savings']
+    expenses = debits[debits['Category'] != 'Savings']
+    
+    total_income = float(credits['Importe'].sum())
+    total_expenses = float(expenses['Importe'].sum())
+    total_savings = float(savings['Importe'].sum())
+    return {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'total_savings': total_savings,
+        'balance': total_income - (total_expenses + total_savings),
+        'credit_count': int(credits['Count'].sum()),
+        'debit_count': int(debits['Count'].sum()),
+        'expense_count': int(expenses['Count'].sum()),
+        'savings_count': int(savings['Count'].sum()),
+        'expense_categories': dict(zip(expenses['Category'], expenses['Importe'].astype(float)))
+    }
 
 def separate_debits_credits(df):
     """
-    Separate transactions into debits and credits, sorted by date.
+    Separate transactions into debits and credits.
     
     Args:
-        df (pandas.DataFrame): Filtered transaction DataFrame
+        df (pandas.DataFrame): Filtered transaction DataFrame, newest first
         
     Returns:
-        tuple: (debits_df, credits_df) both sorted by date descending
+        tuple: (debits_df, credits_df) both keeping the date descending order
     """
-    debits_df = df[df['Tipo'] == 'Debit'].sort_values(by='Fecha valor', ascending=False).copy()
-    credits_df = df[df['Tipo'] == 'Credit'].sort_values(by='Fecha valor', ascending=False).copy()
-    return debits_df, credits_df
+    is_debit = df['Tipo'] == 'Debit'
+    return df[is_debit], df[~is_debit & (df['Tipo'] == 'Credit')]
+
+def search_by_concept(df, search_term):
+    """
+    Filter transactions whose Concepto contains the search term.
+    
+    Frames loaded from the database are indexed by transaction id, so the
+    lookup runs against the full-text index instead of scanning every row.
+    
+    Args:
+        df (pandas.DataFrame): Transaction DataFrame
+        search_term (str): Case-insensitive text to look for
+        
+    Returns:
+        pandas.DataFrame: Matching rows of df
+    """
+    if df.index.name != 'id':
+        mask = df['Concepto'].str.contains(search_term, case=False, na=False, regex=False)
+        return df[mask]
+    
+    matching_ids = st.session_state.db.search_transaction_ids(search_term)
+    return df[df.index.isin(matching_ids)]
 
 # ============================================================================
 # UI COMPONENT FUNCTIONS
@@ -587,25 +1005,19 @@ def render_month_selector(available_months):
         )
     return selected_month
 
-def render_summary_metrics(debits_df, credits_df):
+def render_summary_metrics(summary):
     """
     Render summary financial metrics in a 4-column layout.
     
     Args:
-        debits_df (pandas.DataFrame): Debit transactions
-        credits_df (pandas.DataFrame): Credit transactions
+        summary (dict): Totals from summarize_totals
     """
     col1, col2, col3, col4 = st.columns(4)
     
-    total_income = credits_df['Importe'].sum()
-    
-    # Separate savings from expenses
-    savings_df = debits_df[debits_df['Category'] == 'Savings']
-    expenses_df = debits_df[debits_df['Category'] != 'Savings']
-    
-    total_savings = savings_df['Importe'].sum()
-    total_expenses = expenses_df['Importe'].sum()
-    balance = total_income - (total_expenses + total_savings)
+    total_income = summary['total_income']
+    total_expenses = summary['total_expenses']
+    total_savings = summary['total_savings']
+    balance = summary['balance']
     
     with col1:
         st.metric("💰 Total Income", f"{total_income:,.2f} €")
@@ -637,15 +1049,19 @@ def render_category_management():
     
     return new_category, add_button
 
-def render_transaction_editor(debits_df):
+def render_transaction_editor(selected_month):
     """
-    Render interactive transaction editor with category selection and search functionality.
+    Render the paginated transaction editor with search, sorting and category selection.
+    
+    Search, sorting and paging run in SQL, so only the visible page is read
+    and sent to the browser. The page is kept in session state, indexed by
+    transaction id, for process_category_changes.
     
     Args:
-        debits_df (pandas.DataFrame): Debit transactions DataFrame
+        selected_month (str): Selected month string ('YYYY-MM') or 'All Months'
         
     Returns:
-        pandas.DataFrame: Edited DataFrame from user interactions
+        pandas.DataFrame: Edited page, with the transaction id in the 'id' column
     """
     st.subheader("Your Expenses")
     
@@ -662,24 +1078,58 @@ def render_transaction_editor(debits_df):
         if st.button("🗑️ Clear Search", help="Clear the search filter"):
             st.rerun()
     
-    # Filter the dataframe based on search term
-    filtered_debits_df = debits_df.copy()
+    # Sorting and page size
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort_column = st.selectbox("Sort by", options=EDITOR_SORT_COLUMNS, key="editor_sort_column")
+    with col2:
+        descending = st.selectbox("Order", options=["Descending", "Ascending"], key="editor_sort_order") == "Descending"
+    with col3:
+        page_size = st.selectbox("Rows per page", options=EDITOR_PAGE_SIZES, index=1, key="editor_page_size")
+    
+    start = end = None
+    if selected_month != 'All Months':
+        month = pd.Period(selected_month, freq='M')
+        start, end = month.start_time, (month + 1).start_time
+    filters = {'start': start, 'end': end, 'tipo': 'Debit', 'search_term': search_term or None}
+    
+    total_rows = st.session_state.db.count_transactions(**filters)
     if search_term:
-        # Case-insensitive search in the Concepto column
-        mask = filtered_debits_df['Concepto'].str.contains(search_term, case=False, na=False)
-        filtered_debits_df = filtered_debits_df[mask]
-        
         # Show search results info
-        if len(filtered_debits_df) > 0:
-            st.info(f"🔍 Found {len(filtered_debits_df)} transactions matching '{search_term}'")
+        if total_rows > 0:
+            st.info(f"🔍 Found {total_rows} transactions matching '{search_term}'")
         else:
             st.warning(f"❌ No transactions found matching '{search_term}'")
-            return debits_df  # Return original if no matches
     
-    # Display the filtered data editor
+    # Page controls; a new month, search or page size starts again at page 1
+    page_count = max(1, -(-total_rows // page_size))
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input(
+            "Page", min_value=1, max_value=page_count, value=1, step=1,
+            key=f"editor_page_{selected_month}_{search_term}_{page_size}"
+        )
+    with col2:
+        st.write("")  # Empty space for alignment
+        st.caption(f"Page {page} of {page_count} · {total_rows} transactions")
+    
+    page_df = st.session_state.db.load_transactions(
+        **filters,
+        columns=['Fecha valor', 'Concepto', 'Importe', 'Category'],
+        order_by=sort_column,
+        descending=descending,
+        limit=page_size,
+        offset=(page - 1) * page_size
+    ).astype({'Concepto': object, 'Category': object})
+    st.session_state.editor_page = page_df
+    
+    # Display the page; edits map back to rows through the hidden id column.
+    # Categorical columns would show as dropdowns of the page's values, hence
+    # the plain object columns above
     edited_df = st.data_editor(
-        filtered_debits_df[['Fecha valor', 'Concepto', 'Importe', 'Category']],
+        page_df.reset_index(),
         column_config={
+            "id": None,
             "Fecha valor": st.column_config.DateColumn(
                 format="DD/MM/YYYY"
             ),
@@ -693,7 +1143,8 @@ def render_transaction_editor(debits_df):
         },
         hide_index=True,
         use_container_width=True,
-        key=f"category_editor_{hash(search_term) if search_term else 'all'}"  # Unique key for different searches
+        # Unique key per page, so pending edits never carry over to other rows
+        key=f"category_editor_{hash((selected_month, search_term, sort_column, descending, page_size, page))}"
     )
     
     return edited_df
@@ -703,52 +1154,66 @@ def process_category_changes(edited_df):
     Process changes made in the transaction editor and update categories.
     
     Args:
-        edited_df (pandas.DataFrame): Edited DataFrame from transaction editor
+        edited_df (pandas.DataFrame): Edited page from render_transaction_editor
     """
     save_button = st.button("Save Changes", type="primary")
     if save_button:
         changes_made = 0
-        for idx, row in edited_df.iterrows():
+        page_df = st.session_state.editor_page
+        for _, row in edited_df.iterrows():
+            transaction_id = row['id']
             new_category = row['Category']
-            if new_category == st.session_state.debits_df.at[idx, 'Category']:
+            if new_category == page_df.at[transaction_id, 'Category']:
                 continue
             
             details = row['Concepto']
-            st.session_state.debits_df.at[idx, 'Category'] = new_category
+            merchant_key = normalize_merchant(details)
+            page_df.at[transaction_id, 'Category'] = new_category
             
-            # Update database for all transactions with this concept
-            updated_count = st.session_state.db.update_transactions_by_concept(details, new_category)
+            # A merchant keyword belongs to one category only, so move it:
+            # drop it from every other category, ignoring case as the matcher
+            # does, and write categories.json now, since adding it below is
+            # skipped when the keyword already exists
+            moved = {details.lower().strip(), merchant_key.lower().strip()}
+            moved_from = []
+            for other_category, keywords in st.session_state.categories.items():
+                kept = [keyword for keyword in keywords if keyword.lower().strip() not in moved]
+                if other_category != new_category and len(kept) < len(keywords):
+                    keywords[:] = kept
+                    moved_from.append(other_category)
+            if moved_from:
+                save_categories()
+                st.info(f"Keyword '{merchant_key[:50]}' removed from {', '.join(moved_from)}")
+
+            # Update database for all transactions of this merchant
+            updated_count = st.session_state.db.update_transactions_by_merchant(merchant_key, new_category)
             
-            # Add keyword to category
-            add_keywords_to_category(new_category, details)
+            # Add merchant as keyword to category
+            add_keywords_to_category(new_category, merchant_key)
             
             # Sync categories to database
             st.session_state.db.sync_categories(st.session_state.categories)
             
             changes_made += updated_count
-            st.success(f"✅ Updated {updated_count} transactions with concept '{details[:50]}...' to category '{new_category}'")
+            st.success(f"✅ Updated {updated_count} transactions from merchant '{merchant_key[:50]}' to category '{new_category}'")
         
         if changes_made > 0:
-            # Refresh data from database
-            st.session_state.all_transactions_df = st.session_state.db.load_all_transactions()
+            # The rerun merges just the updated rows into the shared frame
             st.info(f"🔄 Refreshed data - {changes_made} total changes applied to database")
             st.rerun()
 
-def render_expense_summary(debits_df):
+def render_expense_summary(month_totals):
     """
     Render expense summary with category breakdown and pie chart (excluding savings).
     
     Args:
-        debits_df (pandas.DataFrame): Debit transactions DataFrame
+        month_totals (pandas.DataFrame): Category totals from load_month_totals
     """
     st.subheader("Expenses Summary")
     
-    # Exclude savings from expenses summary
-    expenses_df = debits_df[debits_df['Category'] != 'Savings']
-    
-    # Calculate category totals for expenses only
-    category_totals = expenses_df.groupby('Category')['Importe'].sum().reset_index()
-    category_totals = category_totals.sort_values(by='Importe', ascending=False)
+    # Debit category totals, excluding savings
+    expenses = month_totals[(month_totals['Tipo'] == 'Debit') & (month_totals['Category'] != 'Savings')]
+    category_totals = expenses[['Category', 'Importe']].sort_values(by='Importe', ascending=False)
     
     # Display summary table
     st.dataframe(category_totals, column_config={
@@ -909,8 +1374,7 @@ def render_savings_tab(debits_df):
     
     # Filter savings by search term
     if search_term:
-        mask = savings_df['Concepto'].str.contains(search_term, case=False, na=False)
-        filtered_savings_df = savings_df[mask]
+        filtered_savings_df = search_by_concept(savings_df, search_term)
         st.info(f"🔍 Showing {len(filtered_savings_df)} of {len(savings_df)} savings transactions matching '{search_term}'")
     else:
         filtered_savings_df = savings_df
@@ -1014,20 +1478,26 @@ def render_database_info():
     with col1:
         st.info("💾 **Database Location**: `finance_data.db`")
         st.info("🔄 **Auto-sync**: Categories and transactions are automatically synced")
+        
+        writer = st.session_state.db.get_writer_metrics()
+        st.caption(
+            f"✍️ Writer: {writer['queue_depth']} queued, {writer['commits']} commits "
+            f"({writer['writes_per_commit']:.1f} writes each), "
+            f"commit latency {writer['avg_commit_ms']:.1f} ms avg / {writer['max_commit_ms']:.1f} ms max"
+        )
     
     with col2:
         if st.button("🔄 Refresh Data", help="Reload all data from database"):
-            st.session_state.all_transactions_df = st.session_state.db.load_all_transactions()
             st.success("✅ Data refreshed from database")
             st.rerun()
     
     # Recent transactions
     st.subheader("🕒 Recent Transactions")
-    if not st.session_state.all_transactions_df.empty:
-        recent_transactions = st.session_state.all_transactions_df.head(10)
+    recent_transactions = st.session_state.db.load_transactions(limit=10)
+    if not recent_transactions.empty:
         st.dataframe(recent_transactions, use_container_width=True)
 
-def get_ai_analysis(debits_df, credits_df, selected_month):
+def get_ai_analysis(debits_df, credits_df, selected_month, summary):
     """
     Get AI analysis for the given financial data.
     
@@ -1035,6 +1505,7 @@ def get_ai_analysis(debits_df, credits_df, selected_month):
         debits_df (pandas.DataFrame): Debit transactions
         credits_df (pandas.DataFrame): Credit transactions
         selected_month (str): Selected month filter
+        summary (dict): Totals from summarize_totals
         
     Returns:
         tuple: (success: bool, response: str, error: str)
@@ -1044,7 +1515,7 @@ def get_ai_analysis(debits_df, credits_df, selected_month):
         ai_service = OpenAIService()
         
         # Format data for AI
-        formatted_data = format_bank_statement_for_ai(debits_df, credits_df, selected_month)
+        formatted_data = format_bank_statement_for_ai(debits_df, credits_df, selected_month, summary)
         
         # Get AI analysis
         ai_response = ai_service.get_response_bank_statement(formatted_data)
@@ -1054,7 +1525,7 @@ def get_ai_analysis(debits_df, credits_df, selected_month):
     except Exception as e:
         return False, None, str(e)
 
-def render_ai_analysis_section(debits_df, credits_df, selected_month):
+def render_ai_analysis_section(debits_df, credits_df, selected_month, summary):
     """
     Render AI analysis section with automatic updates on month change.
     
@@ -1062,6 +1533,7 @@ def render_ai_analysis_section(debits_df, credits_df, selected_month):
         debits_df (pandas.DataFrame): Debit transactions
         credits_df (pandas.DataFrame): Credit transactions
         selected_month (str): Selected month filter
+        summary (dict): Totals from summarize_totals
     """
     st.markdown("---")
     st.subheader("🤖 AI Financial Analysis")
@@ -1093,7 +1565,7 @@ def render_ai_analysis_section(debits_df, credits_df, selected_month):
     # Auto-trigger analysis if loading state is True
     if st.session_state.get("ai_analysis_loading", False):
         with st.spinner("🧠 AI is analyzing your financial data..."):
-            success, response, error = get_ai_analysis(debits_df, credits_df, selected_month)
+            success, response, error = get_ai_analysis(debits_df, credits_df, selected_month, summary)
             
             if success:
                 st.session_state.ai_analysis_result = response
@@ -1133,6 +1605,16 @@ def render_ai_analysis_section(debits_df, credits_df, selected_month):
 # MAIN APPLICATION FUNCTION
 # ============================================================================
 
+@st.cache_resource
+def get_database():
+    """
+    Open the database once per process.
+    
+    Returns:
+        FinanceDatabase: Instance shared by all sessions, backed by one connection pool
+    """
+    return FinanceDatabase()
+
 def initialize_session_state():
     """
     Initialize Streamlit session state with categories and database if not already present.
@@ -1141,14 +1623,9 @@ def initialize_session_state():
         st.session_state.categories = load_categories()
     
     if "db" not in st.session_state:
-        st.session_state.db = FinanceDatabase()
+        st.session_state.db = get_database()
         print("🗄️ Database connection initialized")
-    
-    if "all_transactions_df" not in st.session_state:
-        # Load all existing transactions from database on app start
-        st.session_state.all_transactions_df = st.session_state.db.load_all_transactions()
-        if not st.session_state.all_transactions_df.empty:
-            print(f"📊 Loaded {len(st.session_state.all_transactions_df)} existing transactions from database")
+
 
 def render_app_header():
     """
@@ -1180,13 +1657,13 @@ def main():
     render_app_header()
     
     # Display database statistics
-    if not st.session_state.all_transactions_df.empty:
-        stats = st.session_state.db.get_database_stats()
+    stats = st.session_state.db.get_database_stats()
+    if stats['total_transactions'] > 0:
         st.info(f"📊 Database contains {stats['total_transactions']} transactions from {stats['date_range'][0]} to {stats['date_range'][1]}")
     
     # File upload section
     st.markdown("### 🚀 Let's Get Started!")
-    if st.session_state.all_transactions_df.empty:
+    if stats['total_transactions'] == 0:
         st.markdown("**Drop your first bank statement here to get started!** ✨")
     else:
         st.markdown("**Upload new monthly statements - duplicates will be automatically skipped!** ✨")
@@ -1197,45 +1674,36 @@ def main():
         help="Drag & drop your bank statement CSV file here - we'll take care of the rest!"
     )
     
-    # Handle file upload and database logic
-    df_to_use = None
-    
     if uploaded_file is not None:
         # Process uploaded file (this will show upload feedback)
-        uploaded_df = load_transactions(uploaded_file)
-        
-        # Use all transactions from database (including any newly added)
-        if not st.session_state.all_transactions_df.empty:
-            df_to_use = st.session_state.all_transactions_df.copy()
-        else:
-            df_to_use = uploaded_df
-            
-    elif not st.session_state.all_transactions_df.empty:
+        load_transactions(uploaded_file)
+    elif stats['total_transactions'] > 0:
         # No upload, but we have existing data in database
-        df_to_use = st.session_state.all_transactions_df.copy()
-        st.success(f"📊 Displaying all {len(df_to_use)} transactions from database")
+        st.success(f"📊 Displaying all {stats['total_transactions']} transactions from database")
     
-    if df_to_use is not None and not df_to_use.empty:
-        # Prepare monthly filtering
-        df_with_months, available_months = prepare_monthly_data(df_to_use)
-        
+    # Read after the upload so newly imported months are included
+    transactions_df, month_index = st.session_state.db.get_transactions_by_month()
+    available_months = [pd.Period(ordinal=code, freq='M') for code in month_index]
+    
+    if available_months:
         # Month selection UI
         selected_month = render_month_selector(available_months)
         
-        # Filter data by selected month
-        filtered_df = filter_data_by_month(df_with_months, selected_month)
+        # A month is a slice of the process-wide frame
+        filtered_df = load_month_transactions(transactions_df, month_index, selected_month)
         
         # Separate debits and credits
         debits_df, credits_df = separate_debits_credits(filtered_df)
         
+        # Totals come from the pre-aggregated monthly table, not the rows
+        month_totals = load_month_totals(selected_month)
+        summary = summarize_totals(month_totals)
+        
         # Display summary metrics
-        render_summary_metrics(debits_df, credits_df)
+        render_summary_metrics(summary)
         
         # AI Analysis Section
-        render_ai_analysis_section(debits_df, credits_df, selected_month)
-        
-        # Store debits in session state for editing
-        st.session_state.debits_df = debits_df.copy()
+        render_ai_analysis_section(debits_df, credits_df, selected_month, summary)
         
         # Create main tabs
         tab1, tab2, tab3 = st.tabs(["Debits", "Credits", "Savings"])
@@ -1244,14 +1712,14 @@ def main():
             # Category management
             render_category_management()
             
-            # Transaction editor
-            edited_df = render_transaction_editor(st.session_state.debits_df)
+            # Transaction editor, one page at a time
+            edited_df = render_transaction_editor(selected_month)
             
             # Process category changes
             process_category_changes(edited_df)
             
             # Expense summary and visualization
-            render_expense_summary(st.session_state.debits_df)
+            render_expense_summary(month_totals)
         
         with tab2:
             # Credits/Income display
@@ -0,0 +1,64 @@
+"""
+Merchant normalization module for Personal Finance Application
+
+Derives a canonical merchant key from raw bank transaction descriptions by
+stripping card numbers, dates, times and purely numeric reference ids, so the
+same shop or direct debit always maps to the same key. Words, including
+brand tokens that mix letters and digits (24H, A3, 7-ELEVEN) and place
+names, are kept.
+"""
+
+import re
+
+import pandas as pd
+
+# Bumped whenever the passes below change, so stored keys get recomputed
+MERCHANT_KEY_VERSION = 2
+
+# Passes applied in order over the whole upper-cased column
+_NORMALIZATION_PASSES = (
+    # Masked or full card numbers: 4111XXXXXXXX1111, **** **** **** 1234, *1234
+    (re.compile(r"(?<!\S)(?=\S*[\d*])[\dX*]{4,}(?:[ -][\dX*]{4}){0,3}(?!\S)|\*+\d+"), " "),
+    # Separators and leftover punctuation runs
+    (re.compile(r"[*#:;,/\\|_()\[\]{}\"']+|(?<!\w)[.-]+|[.-]+(?!\w)"), " "),
+    # Purely numeric tokens: dates, times, amounts and reference numbers
+    (re.compile(r"(?<!\S)[\d.-]*\d[\d.-]*(?!\S)"), " "),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def normalize_merchants(concepts: pd.Series) -> pd.Series:
+    """
+    Derive merchant keys for a whole column of descriptions.
+
+    Each normalization pass is a compiled regex applied to the distinct
+    descriptions of the column; results are mapped back to every row.
+
+    Args:
+        concepts (pd.Series): Concepto column
+
+    Returns:
+        pd.Series: Merchant keys aligned with the input index. Descriptions
+            that normalize to nothing keep their upper-cased original text.
+    """
+    codes, uniques = pd.factorize(concepts.astype(object).fillna(""))
+    original = pd.Series(uniques, dtype=object).str.upper().str.strip()
+    keys = original
+    for pattern, replacement in _NORMALIZATION_PASSES:
+        keys = keys.str.replace(pattern, replacement, regex=True)
+    keys = keys.str.strip()
+    keys = keys.where(keys != "", original)
+    return pd.Series(keys.to_numpy(dtype=object).take(codes), index=concepts.index, dtype=object)
+
+
+def normalize_merchant(concept: str) -> str:
+    """
+    Derive the merchant key for a single description.
+
+    Args:
+        concept (str): Transaction description
+
+    Returns:
+        str: Merchant key
+    """
+    return normalize_merchants(pd.Series([concept], dtype=object)).iloc[0]
@@ -0,0 +1,28 @@
+"""Shared fixtures for the test suite."""
+
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+# The app modules live at the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import FinanceDatabase  # noqa: E402
+
+# main.py imports the OpenAI key from config.py, which each install creates
+# (see README); tests never call the API, so an empty key is enough
+if importlib.util.find_spec("config") is None:
+    config = types.ModuleType("config")
+    config.OPENAI_API_KEY = ""
+    sys.modules["config"] = config
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A FinanceDatabase on a fresh file, closed after the test."""
+    database = FinanceDatabase(str(tmp_path / "finance.db"))
+    yield database
+    database.close()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from amounts import detect_decimal_separator, parse_amounts
+
+
+def test_spanish_amounts_parse_to_cents_and_signs():
+    cents, signs = parse_amounts(pd.Series(["1.234,56 €", "-45,10", "€ 3,5", "12", "1 000,00"]))
+
+    assert cents.tolist() == [123456, 4510, 350, 1200, 100000]
+    assert signs.tolist() == [1, -1, 1, 1, 1]
+
+
+def test_dot_decimal_amounts_and_accounting_negatives():
+    cents, signs = parse_amounts(pd.Series(["$1,234.56", "(12.50)", "12.50-", "−7.25", "+0.99"]))
+
+    assert cents.tolist() == [123456, 1250, 1250, 725, 99]
+    assert signs.tolist() == [1, -1, -1, -1, 1]
+
+
+def test_unreadable_amounts_get_a_zero_sign():
+    cents, signs = parse_amounts(pd.Series(["abc", None, "", "12,345,67", "10,00"]))
+
+    assert signs.tolist() == [0, 0, 0, 0, 1]
+    assert cents.tolist() == [0, 0, 0, 0, 1000]
+
+
+def test_numeric_columns_are_rounded_to_cents():
+    cents, signs = parse_amounts(pd.Series([12.346, -0.1, np.nan, 3.0]))
+
+    assert cents.tolist() == [1235, 10, 0, 300]
+    assert signs.tolist() == [1, -1, 0, 1]
+    assert cents.dtype == np.int64 and signs.dtype == np.int8
+
+
+def test_separator_detection_votes_and_defaults_to_comma():
+    assert detect_decimal_separator(pd.Series(["1.234,56", "7,5", "3.10"])) == ","
+    assert detect_decimal_separator(pd.Series(["1,234.56", "7.5", "3,10"])) == "."
+    assert detect_decimal_separator(pd.Series(["12", "1.234", "1,234"])) == ","
+
+
+def test_given_separator_overrides_detection():
+    values = pd.Series(["1,234", "45"])
+
+    assert parse_amounts(values)[1].tolist() == [0, 1]
+    assert parse_amounts(values, ".")[0].tolist() == [123400, 4500]
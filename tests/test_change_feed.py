@@ -0,0 +1,123 @@
+import pandas as pd
+
+from database import build_month_index, merge_transaction_changes
+from test_database import make_transactions
+
+
+def test_feed_is_empty_until_something_is_written(db):
+    db.import_transactions(make_transactions(["SHOP A", "SHOP B"]))
+    watermark = db.get_change_watermark()
+
+    changes, next_watermark = db.get_changes(watermark)
+
+    assert changes.empty
+    assert next_watermark == watermark
+
+
+def test_category_change_returns_only_the_changed_rows(db):
+    db.import_transactions(make_transactions(["SHOP A", "SHOP B", "SHOP C"]))
+    watermark = db.get_change_watermark()
+
+    db.update_transactions_by_merchant("SHOP B", "Groceries")
+    changes, watermark = db.get_changes(watermark)
+
+    assert changes['Concepto'].tolist() == ["SHOP B"]
+    assert changes['Category'].tolist() == ["Groceries"]
+    assert db.get_changes(watermark)[0].empty
+
+
+def test_updates_in_one_commit_are_all_reported(db):
+    db.import_transactions(make_transactions(["SHOP A", "SHOP B"]))
+    watermark = db.get_change_watermark()
+
+    # Same millisecond, same clock reading: versions still tell them apart
+    db.update_categories_by_merchant({"SHOP A": "Groceries"})
+    db.update_categories_by_merchant({"SHOP B": "Transport"})
+    changes, _ = db.get_changes(watermark)
+
+    assert sorted(changes['Category'].tolist()) == ["Groceries", "Transport"]
+
+
+def test_new_rows_arrive_in_the_public_shape(db):
+    watermark = db.get_change_watermark()
+    db.import_transactions(make_transactions(["SHOP A"], dates=["2024-05-02"], amounts=[12.34]))
+
+    changes, _ = db.get_changes(watermark)
+
+    assert list(changes.columns) == ['Fecha valor', 'Concepto', 'Importe', 'Tipo', 'Category']
+    assert changes.iloc[0]['Fecha valor'] == pd.Timestamp("2024-05-02")
+    assert changes.iloc[0]['Importe'] == 12.34
+
+
+def test_merge_adds_new_categories_and_leaves_the_input_alone(db):
+    db.import_transactions(make_transactions(["SHOP A", "SHOP B"]))
+    frame = db.load_transactions()
+    watermark = db.get_change_watermark()
+
+    db.update_transactions_by_merchant("SHOP A", "Groceries")
+    changes, _ = db.get_changes(watermark)
+    merged = merge_transaction_changes(frame, changes)
+
+    assert "Groceries" not in frame['Category'].cat.categories
+    assert set(frame['Category']) == {"Uncategorized"}
+    assert merged.loc[changes.index[0], 'Category'] == "Groceries"
+    assert merged['Category'].dtype == 'category'
+    pd.testing.assert_frame_equal(merged, db.load_transactions(), check_categorical=False)
+
+
+def test_merge_places_new_rows_in_date_order(db):
+    db.import_transactions(make_transactions(["SHOP A", "SHOP B"], dates=["2024-03-01", "2024-05-01"]))
+    frame = db.load_transactions()
+    watermark = db.get_change_watermark()
+
+    db.import_transactions(make_transactions(
+        ["SHOP C", "SHOP D"], dates=["2024-04-01", "2024-06-01"], tipo="Credit"
+    ))
+    changes, _ = db.get_changes(watermark)
+    merged = merge_transaction_changes(frame, changes)
+
+    assert merged['Concepto'].tolist() == ["SHOP D", "SHOP B", "SHOP C", "SHOP A"]
+    pd.testing.assert_frame_equal(merged, db.load_transactions(), check_categorical=False)
+
+
+def test_shared_frame_follows_writes(db):
+    db.import_transactions(make_transactions(["SHOP A"]))
+    before = db.get_transactions_frame()
+
+    db.update_transactions_by_merchant("SHOP A", "Groceries")
+    db.import_transactions(make_transactions(["SHOP B"], dates=["2024-04-01"]))
+    after = db.get_transactions_frame()
+
+    assert before['Category'].tolist() == ["Uncategorized"]
+    assert after['Category'].tolist() == ["Uncategorized", "Groceries"]
+    assert db.get_transactions_frame() is after
+
+
+def test_month_index_slices_match_a_month_mask(db):
+    db.import_transactions(make_transactions(
+        ["SHOP A", "SHOP B", "SHOP C", "SHOP D", "SHOP E"],
+        dates=["2024-01-31", "2024-03-01", "2023-12-15", "2024-03-31", "2024-01-01"],
+    ))
+    frame, month_index = db.get_transactions_by_month()
+
+    months = frame['Fecha valor'].dt.to_period('M').map(lambda month: month.ordinal)
+    assert list(month_index) == [pd.Period(month, 'M').ordinal for month in ("2024-03", "2024-01", "2023-12")]
+    for code, rows in month_index.items():
+        expected = frame[months == code]
+        pd.testing.assert_frame_equal(frame.iloc[rows], expected)
+
+
+def test_month_index_of_an_empty_column():
+    assert build_month_index(pd.Series([], dtype='datetime64[ns]')) == {}
+
+
+def test_shared_frame_loaded_from_an_empty_database_keeps_its_dtypes(db):
+    empty = db.get_transactions_frame()
+
+    db.import_transactions(make_transactions(["SHOP A"], amounts=[12.5]))
+    frame = db.get_transactions_frame()
+
+    assert empty['Importe'].dtype == 'float64'
+    assert frame['Importe'].dtype == 'float64'
+    assert frame['Fecha valor'].dtype == 'datetime64[ns]'
+    pd.testing.assert_frame_equal(frame, db.load_transactions(), check_categorical=False)
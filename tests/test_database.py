@@ -0,0 +1,231 @@
+import sqlite3
+
+import pandas as pd
+
+from database import (
+    IMPORT_STATUS_DUPLICATE, IMPORT_STATUS_INVALID, IMPORT_STATUS_NEW, TRANSACTIONS_TABLE_SQL,
+    FinanceDatabase
+)
+
+
+def make_transactions(concepts, dates=None, amounts=None, tipo="Debit", category="Uncategorized"):
+    """Build an import frame, one row per concept."""
+    count = len(concepts)
+    return pd.DataFrame({
+        'Fecha valor': pd.to_datetime(dates or ["2024-03-01"] * count),
+        'Concepto': concepts,
+        'Importe': amounts or [10.0 + i for i in range(count)],
+        'Tipo': tipo,
+        'Category': category,
+    })
+
+
+def test_last_modified_uses_one_format_for_inserts_and_updates(db):
+    db.import_transactions(make_transactions(["SHOP A", "SHOP B"]))
+    db.update_transactions_by_merchant("SHOP A", "Groceries")
+
+    with db.connection() as conn:
+        stamps = [row[0] for row in conn.execute("SELECT last_modified FROM transactions")]
+    assert all(len(stamp) == len("2024-03-01 12:00:00.000") for stamp in stamps)
+
+
+def test_rows_inserted_after_an_update_are_past_the_label_watermark(db):
+    db.import_transactions(make_transactions(["SHOP A"]))
+    db.update_transactions_by_merchant("SHOP A", "Groceries")
+    _, watermark = db.get_merchant_labels()
+
+    db.import_transactions(make_transactions(["SHOP B"], dates=["2024-03-02"]))
+    labels, _ = db.get_merchant_labels(watermark)
+
+    assert "SHOP B" in labels
+
+
+def test_second_precision_tables_are_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(TRANSACTIONS_TABLE_SQL.format(table="transactions").replace(
+        "DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))", "DEFAULT CURRENT_TIMESTAMP"
+    ))
+    conn.execute("""
+        INSERT INTO transactions
+        (id, dedupe_key, fecha_valor, concepto, merchant_key, importe_cents, tipo, category, last_modified)
+        VALUES (7, 1, 19783, 'SHOP A', 'SHOP A', 1000, 'Debit', 'Uncategorized', '2024-03-01 10:00:05')
+    """)
+    conn.commit()
+    conn.close()
+
+    db = FinanceDatabase(path)
+    try:
+        with db.connection() as conn:
+            row = conn.execute("SELECT id, last_modified FROM transactions").fetchone()
+            table_sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'transactions'"
+            ).fetchone()[0]
+        assert row == (7, '2024-03-01 10:00:05.000')
+        assert "%H:%M:%f" in table_sql
+        assert db.get_category_totals()['Count'].sum() == 1
+    finally:
+        db.close()
+
+
+def test_legacy_migration_keeps_colliding_rows_aside(tmp_path, capsys):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_hash TEXT UNIQUE NOT NULL,
+            fecha_valor TEXT NOT NULL,
+            concepto TEXT NOT NULL,
+            importe REAL NOT NULL,
+            tipo TEXT NOT NULL,
+            category TEXT NOT NULL,
+            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # The first two hashed differently ('2024-03-01' vs '2024-03-01 00:00:00')
+    conn.executemany("""
+        INSERT INTO transactions (transaction_hash, fecha_valor, concepto, importe, tipo, category)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [
+        ("h1", "2024-03-01", "SHOP A", 10.0, "Debit", "Uncategorized"),
+        ("h2", "2024-03-01 00:00:00", "SHOP A", 10.0, "Debit", "Groceries"),
+        ("h3", "2024-03-02", "SHOP B", 5.5, "Debit", "Uncategorized"),
+    ])
+    conn.commit()
+    conn.close()
+
+    db = FinanceDatabase(path)
+    try:
+        with db.connection() as conn:
+            kept = conn.execute("SELECT id FROM transactions ORDER BY id").fetchall()
+            collisions = conn.execute("SELECT id, category, kept_id FROM migration_collisions").fetchall()
+        assert kept == [(1,), (3,)]
+        assert collisions == [(2, "Groceries", 1)]
+        assert "id 2 (2024-03-01, 'SHOP A', 10.0) duplicates id 1" in capsys.readouterr().out
+    finally:
+        db.close()
+
+
+def test_monthly_totals_setup_stays_in_the_open_transaction(db, tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "rollback.db"))
+    conn.execute(TRANSACTIONS_TABLE_SQL.format(table="transactions"))
+    conn.commit()
+
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    db._init_monthly_totals(cursor)
+    conn.rollback()
+
+    created = conn.execute(
+        "SELECT name FROM sqlite_master WHERE name LIKE 'monthly_%'"
+    ).fetchall()
+    conn.close()
+    assert created == []
+
+
+def test_monthly_totals_follow_category_changes(db):
+    db.import_transactions(make_transactions(["SHOP A", "SHOP B"], amounts=[10.0, 2.5]))
+    db.update_transactions_by_merchant("SHOP A", "Groceries")
+
+    totals = db.get_monthly_totals()
+    assert totals[['Month', 'Category', 'Importe', 'Count']].values.tolist() == [
+        ["2024-03", "Groceries", 10.0, 1],
+        ["2024-03", "Uncategorized", 2.5, 1],
+    ]
+
+
+def test_pages_cover_the_sort_order_once(db):
+    db.import_transactions(make_transactions(
+        ["SHOP A", "SHOP B", "SHOP C", "SHOP D", "SHOP E", "SHOP F", "SHOP G"],
+        dates=["2024-03-05", "2024-03-01", "2024-03-03", "2024-03-01", "2024-03-07", "2024-03-02", "2024-03-01"],
+        amounts=[5.0, 1.0, 3.0, 1.0, 7.0, 2.0, 9.0],
+    ))
+    full = db.load_transactions(order_by='Importe', descending=False)
+    pages = [
+        db.load_transactions(order_by='Importe', descending=False, limit=3, offset=offset)
+        for offset in (0, 3, 6)
+    ]
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert pd.concat(pages).index.tolist() == full.index.tolist()
+    assert full['Importe'].tolist() == [1.0, 1.0, 2.0, 3.0, 5.0, 7.0, 9.0]
+    # Equal amounts keep a stable order through the id tie-break
+    assert full.index[0] < full.index[1]
+    assert db.count_transactions() == 7
+
+
+def test_default_order_is_newest_first(db):
+    db.import_transactions(make_transactions(
+        ["SHOP A", "SHOP B", "SHOP C"], dates=["2024-03-02", "2024-04-01", "2024-03-15"]
+    ))
+
+    newest_first = db.load_transactions(columns=['Fecha valor', 'Concepto'])
+    by_concept = db.load_transactions(columns=['Concepto'], order_by='Concepto', descending=True)
+
+    assert newest_first['Concepto'].tolist() == ["SHOP B", "SHOP C", "SHOP A"]
+    assert by_concept['Concepto'].tolist() == ["SHOP C", "SHOP B", "SHOP A"]
+
+
+def test_count_applies_the_same_filters_as_the_page(db):
+    db.import_transactions(make_transactions(["MERCADONA 1", "MERCADONA 2", "RENFE"], tipo="Debit"))
+    db.import_transactions(make_transactions(["MERCADONA REFUND"], tipo="Credit"))
+
+    filters = dict(tipo="Debit", search_term="mercadona")
+    page = db.load_transactions(**filters, limit=1)
+
+    assert db.count_transactions(**filters) == 2
+    assert len(page) == 1
+    assert db.count_transactions(start="2024-04-01") == 0
+
+
+def test_import_report_marks_every_row(db):
+    first = make_transactions(["SHOP A", "SHOP B"])
+    first_report = db.import_transactions(first)
+
+    batch = make_transactions(["SHOP A", "SHOP C", "SHOP C", None], amounts=[10.0, 3.0, 3.0, 4.0])
+    report = db.import_transactions(batch)
+
+    assert first_report['Status'].tolist() == [IMPORT_STATUS_NEW, IMPORT_STATUS_NEW]
+    assert report['Status'].tolist() == [
+        IMPORT_STATUS_DUPLICATE, IMPORT_STATUS_NEW, IMPORT_STATUS_DUPLICATE, IMPORT_STATUS_INVALID
+    ]
+    ids = report['Transaction ID']
+    # Duplicates point at the stored row they repeat, inside the batch or before it
+    assert ids.iloc[0] == first_report['Transaction ID'].iloc[0]
+    assert ids.iloc[2] == ids.iloc[1]
+    assert pd.isna(ids.iloc[3])
+    assert db.count_transactions() == 3
+
+
+def test_rebase_drops_memo_entries_for_non_ascii_keywords(db):
+    db.save_merchant_categories(
+        {"PANADERIA PEÑA": "Uncategorized", "PANADERIA SOL": "Uncategorized"}, "v1"
+    )
+
+    db.rebase_merchant_categories("v1", "v2", ["peña"])
+
+    assert db.get_merchant_categories(["PANADERIA PEÑA", "PANADERIA SOL"], "v2") == {
+        "PANADERIA SOL": "Uncategorized"
+    }
+
+
+def test_merchant_labels_follow_versions_through_the_index(db):
+    db.import_transactions(make_transactions(["SHOP A", "SHOP B"]))
+    db.update_transactions_by_merchant("SHOP A", "Groceries")
+    labels, watermark = db.get_merchant_labels()
+
+    db.update_transactions_by_merchant("SHOP B", "Transport")
+    changed, next_watermark = db.get_merchant_labels(watermark)
+
+    assert labels == {"SHOP A": "Groceries", "SHOP B": "Uncategorized"}
+    assert changed == {"SHOP B": "Transport"}
+    assert next_watermark == db.get_change_watermark()
+    with db.connection() as conn:
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT merchant_key, category, MAX(version) FROM transactions
+            WHERE version > ? AND +merchant_key IS NOT NULL GROUP BY +merchant_key
+        """, (watermark,)).fetchall()
+    assert "idx_version" in plan[0][3]
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+import streamlit as st
+
+import main
+from test_database import make_transactions
+
+
+@pytest.fixture
+def app(db, tmp_path, monkeypatch):
+    """Session state on a fresh database, with categories.json in tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main.st, "button", lambda *args, **kwargs: True)
+    monkeypatch.setattr(main.st, "rerun", lambda: None)
+    st.session_state.db = db
+    st.session_state.categories = {"Uncategorized": [], "Groceries": ["mercadona"], "Eating Out": []}
+    return db
+
+
+def edit_category(db, concept, new_category):
+    """Change one row's category in the editor and press Save Changes."""
+    page = db.load_transactions(columns=['Fecha valor', 'Concepto', 'Importe', 'Category'])
+    st.session_state.editor_page = page.astype({'Category': object})
+    edited = page.reset_index().astype({'Category': object})
+    edited.loc[edited['Concepto'] == concept, 'Category'] = new_category
+    main.process_category_changes(edited)
+
+
+def test_moving_a_merchant_removes_its_keyword_whatever_the_case(app):
+    app.import_transactions(make_transactions(["MERCADONA", "MERCADONA"], amounts=[5.0, 6.0],
+                                              category="Groceries"))
+
+    edit_category(app, "MERCADONA", "Eating Out")
+
+    with open(main.CATEGORIES_FILE) as f:
+        saved = json.load(f)
+    assert saved["Groceries"] == []
+    assert saved["Eating Out"] == ["MERCADONA"]
+    assert app.load_transactions()['Category'].tolist() == ["Eating Out", "Eating Out"]
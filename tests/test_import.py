@@ -0,0 +1,65 @@
+import io
+
+import pytest
+import streamlit as st
+
+import main
+from database import FinanceDatabase
+
+CATEGORIES = {"Uncategorized": [], "Groceries": ["MERCADONA"]}
+
+
+def make_csv(rows):
+    """A bank export of (day, amount) rows, as the upload widget hands it over."""
+    lines = ["Fecha valor,Concepto,Importe,Saldo"]
+    lines += [f'{day:02d}/03/2024,COMPRA MERCADONA {day},"{amount}",0' for day, amount in rows]
+    return io.BytesIO("\n".join(lines).encode())
+
+
+@pytest.fixture
+def session(tmp_path):
+    """Point the app's session state at a fresh database per call."""
+    databases = []
+
+    def open_database(name):
+        database = FinanceDatabase(str(tmp_path / name))
+        databases.append(database)
+        st.session_state.db = database
+        st.session_state.categories = CATEGORIES
+        return database
+
+    yield open_database
+    for database in databases:
+        database.close()
+
+
+def test_streamed_import_matches_a_whole_file_import(session):
+    # The second chunk only holds thousands and whole amounts, which on their
+    # own would be read with the other decimal convention
+    rows = [(1, "12.50"), (2, "-7.25"), (3, "3.10"),
+            (4, "1,234"), (5, "-2,500"), (6, "45"),
+            (7, "abc"), (8, "9.99"), (1, "12.50")]
+
+    session("whole.db")
+    file = make_csv(rows)
+    whole = st.session_state.db.import_transactions(
+        main.categorize_transactions(main.parse_transactions_csv(file))
+    )
+    whole_count = st.session_state.db.count_transactions()
+
+    session("streamed.db")
+    _, streamed, rows_read = main.stream_transactions_file(make_csv(rows), chunksize=3)
+    streamed_count = st.session_state.db.count_transactions()
+
+    assert rows_read == len(rows)
+    assert streamed_count == whole_count
+    assert streamed['Status'].value_counts().to_dict() == whole['Status'].value_counts().to_dict()
+    assert whole['Status'].value_counts().to_dict() == {"new": 7, "invalid": 1, "duplicate": 1}
+
+
+def test_whole_euro_spanish_amounts_keep_their_thousands(session):
+    session("thousands.db")
+    df = main.parse_transactions_csv(make_csv([(1, "2.500"), (2, "-1.200"), (3, "45")]))
+
+    assert df['Importe'].tolist() == [2500.0, 1200.0, 45.0]
+    assert df['Tipo'].tolist() == ["Credit", "Debit", "Credit"]
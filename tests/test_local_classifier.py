@@ -0,0 +1,61 @@
+from local_classifier import DEFAULT_CONFIDENCE_THRESHOLD, LocalClassifier, refresh_from_database
+from test_database import make_transactions
+
+TRAINING = {
+    'MERCADONA': 'Groceries', 'CARREFOUR': 'Groceries', 'LIDL': 'Groceries',
+    'REPSOL': 'Fuel', 'CEPSA': 'Fuel',
+    'NETFLIX': 'Subscriptions', 'SPOTIFY': 'Subscriptions',
+}
+
+
+def trained(labels=TRAINING):
+    model = LocalClassifier()
+    model.update(labels)
+    return model
+
+
+def test_a_single_category_model_predicts_nothing():
+    labels, confidence = trained({'MERCADONA': 'Groceries'}).predict(
+        ['NETFLIX', 'AYUNTAMIENTO MADRID', 'MERCADONA']
+    )
+
+    assert labels == ['Uncategorized'] * 3
+    assert confidence.tolist() == [0.0, 0.0, 0.0]
+
+
+def test_unrelated_merchants_are_left_for_the_llm():
+    labels, confidence = trained().predict(['RESTAURANTE EL PUERTO', 'AYUNTAMIENTO MADRID', ''])
+
+    assert labels == ['Uncategorized'] * 3
+    assert (confidence < DEFAULT_CONFIDENCE_THRESHOLD).all()
+
+
+def test_merchants_close_to_the_training_data_are_predicted():
+    labels, confidence = trained().predict(['MERCADONA VALENCIA', 'GASOLINERA CEPSA', 'NETFLIX'])
+
+    assert labels == ['Groceries', 'Fuel', 'Subscriptions']
+    assert (confidence >= DEFAULT_CONFIDENCE_THRESHOLD).all()
+
+
+def test_relabeled_merchants_move_class():
+    model = trained()
+    model.update({'REPSOL': 'Transport', 'CEPSA': 'Transport'})
+
+    labels, _ = model.predict(['REPSOL'])
+
+    assert labels == ['Transport']
+
+
+def test_refresh_learns_relabels_past_the_version_watermark(db, tmp_path):
+    db.import_transactions(make_transactions(["MERCADONA", "REPSOL"]))
+    db.update_transactions_by_merchant("MERCADONA", "Groceries")
+    model, path = LocalClassifier(), str(tmp_path / "model.npz")
+
+    assert refresh_from_database(model, db, path) == 1
+    db.update_transactions_by_merchant("REPSOL", "Fuel")
+    assert refresh_from_database(model, db, path) == 1
+    assert refresh_from_database(model, db, path) == 0
+
+    restored = LocalClassifier.load(path)
+    assert restored.watermark == db.get_change_watermark()
+    assert restored.trained == {"MERCADONA": "Groceries", "REPSOL": "Fuel"}
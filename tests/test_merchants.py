@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from categorizer import KeywordMatcher, get_matcher
+from merchants import normalize_merchant, normalize_merchants
+
+
+@pytest.mark.parametrize("concept, expected", [
+    ("COMPRA TARJ. 4111XXXXXXXX1111 MERCADONA VALENCIA ES", "COMPRA TARJ MERCADONA VALENCIA ES"),
+    ("PAGO **** **** **** 1234 AMAZON 12/03/2024 14:35", "PAGO AMAZON"),
+    ("*1234 NETFLIX.COM", "NETFLIX.COM"),
+    ("RECIBO ENDESA REF 12345678", "RECIBO ENDESA REF"),
+    ("BIZUM 2024.03.12 JUAN", "BIZUM JUAN"),
+    ("TRANSFERENCIA 0049-1234-56", "TRANSFERENCIA"),
+])
+def test_strips_card_numbers_dates_and_numeric_references(concept, expected):
+    assert normalize_merchant(concept) == expected
+
+
+@pytest.mark.parametrize("concept, expected", [
+    ("CAFE 24H", "CAFE 24H"),
+    ("A3 TRANSPORTES", "A3 TRANSPORTES"),
+    ("7-Eleven Madrid", "7-ELEVEN MADRID"),
+    ("LA CORUÑA ESPAÑA", "LA CORUÑA ESPAÑA"),
+])
+def test_keeps_brand_tokens_and_place_names(concept, expected):
+    assert normalize_merchant(concept) == expected
+
+
+def test_same_merchant_maps_to_one_key():
+    concepts = pd.Series([
+        "COMPRA TARJ. 4111XXXXXXXX1111 MERCADONA 12/03",
+        "COMPRA TARJ. 4222XXXXXXXX2222 MERCADONA 15/04",
+    ])
+    assert normalize_merchants(concepts).nunique() == 1
+
+
+def test_empty_key_falls_back_to_original_text():
+    assert normalize_merchant("12345") == "12345"
+
+
+@pytest.mark.parametrize("keyword, concept", [
+    ("24h", "COMPRA CAFE 24H 12/03"),
+    ("A3", "RECIBO A3 TRANSPORTES REF 123456"),
+    ("7-eleven", "COMPRA TARJ. 4111XXXXXXXX1111 7-ELEVEN"),
+    ("bar madrid", "PAGO MOVIL EN BAR MADRID 14:35"),
+])
+def test_digit_bearing_and_multi_word_keywords_match_merchant_keys(keyword, concept):
+    matcher = get_matcher({"Uncategorized": [], "Target": [keyword]})
+    assert matcher.match(normalize_merchant(concept)) == "Target"
+
+
+def test_multi_word_keyword_does_not_match_on_first_word_only():
+    matcher = KeywordMatcher({"Uncategorized": [], "Eating Out": ["bar madrid"]})
+    assert matcher.match(normalize_merchant("BAR ZARAGOZA")) == "Uncategorized"
+    assert matcher.match(normalize_merchant("BARBERIA SOL")) == "Uncategorized"
+
+
+def test_longest_keyword_wins_then_first_category():
+    matcher = KeywordMatcher({
+        "Uncategorized": [],
+        "Shopping": ["amazon"],
+        "Subscriptions": ["amazon prime"],
+        "Other": ["amazon"],
+    })
+    assert matcher.match("AMAZON PRIME") == "Subscriptions"
+    assert matcher.match("AMAZON") == "Shopping"
+
+
+def test_stored_keys_are_recomputed_when_rules_change(db):
+    df = pd.DataFrame({
+        'Fecha valor': pd.to_datetime(["2024-03-01"]),
+        'Concepto': ["CAFE 24H"],
+        'Importe': [3.5],
+        'Tipo': ["Debit"],
+        'Category': ["Uncategorized"],
+    })
+    db.import_transactions(df)
+    with db.connection() as conn:
+        conn.execute("UPDATE transactions SET merchant_key = 'CAFE'")
+        conn.execute("PRAGMA user_version = 1")
+
+    db._create_schema()
+
+    with db.connection() as conn:
+        assert conn.execute("SELECT merchant_key FROM transactions").fetchone()[0] == "CAFE 24H"
@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database import ConnectionPool, DatabaseWriter, FinanceDatabase
+from test_database import make_transactions
+
+
+@pytest.fixture
+def writer(tmp_path):
+    """A writer on a fresh file with one table of numbers."""
+    pool = ConnectionPool(str(tmp_path / "writer.db"))
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE numbers (n INTEGER UNIQUE)")
+    writer = DatabaseWriter(pool)
+    yield writer, pool
+    writer.close()
+    pool.close()
+
+
+def insert(n):
+    def write(cursor):
+        cursor.execute("INSERT INTO numbers (n) VALUES (?)", (n,))
+        return n
+    return write
+
+
+def hold_writer(writer):
+    """Keep the writer thread busy until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def write(cursor):
+        started.set()
+        release.wait(5)
+    future = writer.submit(write)
+    started.wait(5)
+    return future, release
+
+
+def stored(pool):
+    with pool.connection() as conn:
+        return [row[0] for row in conn.execute("SELECT n FROM numbers ORDER BY n")]
+
+
+def test_failing_write_is_rolled_back_alone(writer):
+    writer, pool = writer
+
+    def insert_then_fail(cursor):
+        cursor.execute("INSERT INTO numbers (n) VALUES (2)")
+        cursor.execute("INSERT INTO numbers (n) VALUES (1)")
+
+    blocker, release = hold_writer(writer)
+    futures = [writer.submit(insert(1)), writer.submit(insert_then_fail), writer.submit(insert(3))]
+    release.set()
+    blocker.result(5)
+
+    assert futures[0].result(5) == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result(5)
+    assert futures[2].result(5) == 3
+    assert stored(pool) == [1, 3]
+
+
+def test_queued_writes_share_one_commit(writer):
+    writer, _ = writer
+
+    blocker, release = hold_writer(writer)
+    futures = [writer.submit(insert(n)) for n in range(10)]
+    release.set()
+    for future in [blocker, *futures]:
+        future.result(5)
+
+    metrics = writer.metrics()
+    assert metrics['commits'] == 2
+    assert metrics['writes'] == 11
+    assert metrics['failed_writes'] == 0
+    assert metrics['writes_per_commit'] == 5.5
+    assert metrics['queue_depth'] == 0
+    assert metrics['max_commit_ms'] >= metrics['avg_commit_ms'] > 0
+    assert writer.generation == 2
+
+
+def test_writes_after_close_fail_fast(writer):
+    writer, _ = writer
+    writer.close()
+
+    with pytest.raises(RuntimeError):
+        writer.submit(insert(1)).result(1)
+
+
+def test_closing_one_instance_keeps_the_others_writing(tmp_path):
+    path = str(tmp_path / "shared.db")
+    first, second = FinanceDatabase(path), FinanceDatabase(path)
+
+    first.close()
+    report = second.import_transactions(make_transactions(["SHOP A"]))
+    second.close()
+
+    assert report['Status'].tolist() == ["new"]
+    with pytest.raises(RuntimeError):
+        second.import_transactions(make_transactions(["SHOP B"]))